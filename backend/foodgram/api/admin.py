@@ -0,0 +1,49 @@
+import os
+
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from foodgram.settings import PROFILER_DIR
+from .models import ProfileReport
+
+
+class ProfileReportAdmin(admin.ModelAdmin):
+    list_display = ('created', 'view', 'mode', 'sampled', 'duration',
+                    'download')
+    list_filter = ('view', 'mode', 'sampled')
+    readonly_fields = ('view', 'path', 'mode', 'sampled', 'duration',
+                       'file', 'created', 'download')
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description='Скачать')
+    def download(self, obj):
+        return format_html(
+            '<a href="{}">{}</a>',
+            reverse('admin:api_profilereport_download', args=[obj.pk]),
+            obj.file
+        )
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/',
+                 self.admin_site.admin_view(self.download_view),
+                 name='api_profilereport_download'),
+            *super().get_urls(),
+        ]
+
+    def download_view(self, request, pk):
+        report = self.get_object(request, str(pk))
+        if report is None or not self.has_view_permission(request, report):
+            raise Http404
+        try:
+            file = open(os.path.join(PROFILER_DIR, report.file), 'rb')
+        except FileNotFoundError:
+            raise Http404
+        return FileResponse(file, as_attachment=True, filename=report.file)
+
+
+admin.site.register(ProfileReport, ProfileReportAdmin)
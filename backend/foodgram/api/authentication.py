@@ -0,0 +1,91 @@
+import copy
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from foodgram.settings import AUTH_TOKEN_CACHE_SIZE, AUTH_TOKEN_CACHE_TTL
+from users.models import User
+from .cache import get_auth_version
+
+USER_CLAIMS = ('email', 'username', 'first_name', 'last_name', 'is_staff',
+               'is_superuser')
+
+
+class TokenCache:
+    """LRU-кэш пользователей по ключу токена.
+
+    Запись сверяется с версией пользователя в общем кэше: выход, смена
+    пароля или изменение пользователя в любом воркере её сбрасывают.
+    """
+
+    def __init__(self, maxsize=AUTH_TOKEN_CACHE_SIZE,
+                 ttl=AUTH_TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if (monotonic() >= entry['expires'] or entry['version']
+                != get_auth_version(entry['user'].pk)):
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        return copy.copy(entry['user'])
+
+    def store(self, key, user):
+        entry = {
+            'user': copy.copy(user),
+            'version': get_auth_version(user.pk),
+            'expires': monotonic() + self.ttl,
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        if user is not None:
+            return user, Token(key=key, user=user)
+        user, token = super().authenticate_credentials(key)
+        token_cache.store(key, user)
+        return user, token
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """Пользователь собирается из данных токена без запроса к базе."""
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(
+                'Токен не содержит идентификатора пользователя.')
+        user = User(**{
+            api_settings.USER_ID_FIELD:
+                validated_token[api_settings.USER_ID_CLAIM]
+        }, **{
+            claim: validated_token[claim]
+            for claim in USER_CLAIMS if claim in validated_token
+        })
+        user._state.adding = False
+        user._state.db = 'default'
+        return user
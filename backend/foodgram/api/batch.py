@@ -0,0 +1,126 @@
+from functools import partial
+
+from django.db import connection, transaction
+
+from recipes.models import ShoppingCart
+from users.models import Follow, User
+from .cache import bump_cart_version, bump_membership_version
+from .feed import backfill_feed, trim_feed
+from .membership import FIELDS, membership_cache
+from .signals import COUNTERS
+from .utils import change_counter
+
+CREATED = 'created'
+EXISTS = 'exists'
+DELETED = 'deleted'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+
+def insert_many(model, user, field, ids):
+    """INSERT ... SELECT ... ON CONFLICT DO NOTHING одним запросом.
+
+    Связи создаются только для существующих объектов; возвращает id
+    объектов, для которых запись действительно добавлена.
+    """
+    target = model._meta.get_field(field)
+    related = target.related_model._meta
+    user_column = model._meta.get_field('user').column
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(model._meta.db_table)} '
+            f'({quote(user_column)}, {quote(target.column)}) '
+            f'SELECT %s, {quote(related.pk.column)} '
+            f'FROM {quote(related.db_table)} '
+            f'WHERE {quote(related.pk.column)} IN ({placeholders}) '
+            f'ON CONFLICT DO NOTHING RETURNING {quote(target.column)}',
+            [user.pk, *ids]
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def delete_many(model, user, field, ids=None):
+    """DELETE ... WHERE id IN (...) одним запросом; возвращает удалённые id.
+
+    Без ids удаляет все записи пользователя.
+    """
+    column = quote(model._meta.get_field(field).column)
+    sql = (f'DELETE FROM {quote(model._meta.db_table)} '
+           f'WHERE {quote(model._meta.get_field("user").column)} = %s')
+    params = [user.pk]
+    if ids is not None:
+        sql += f' AND {column} IN ({", ".join(["%s"] * len(ids))})'
+        params.extend(ids)
+    with connection.cursor() as cursor:
+        cursor.execute(f'{sql} RETURNING {column}', params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+def apply_changes(model, user, ids, added):
+    """Пакетные запросы минуют сигналы, поэтому их работа делается здесь.
+
+    Счётчики меняются в той же транзакции, а кэши и лента — после
+    коммита: иначе параллельный запрос успеет закэшировать старые данные
+    под новой версией.
+    """
+    if not ids:
+        return
+    target_model, _, field = COUNTERS[model]
+    change_counter(target_model.objects.filter(pk__in=ids), field,
+                   1 if added else -1)
+    transaction.on_commit(partial(publish_changes, model, user, ids, added))
+
+
+def publish_changes(model, user, ids, added):
+    if model in FIELDS:
+        bump_membership_version(user.id)
+        membership_cache.update(user.id, model, ids, added)
+    if model is ShoppingCart:
+        bump_cart_version(user.id)
+    if model is Follow:
+        if added:
+            for author in User.objects.filter(pk__in=ids):
+                backfill_feed(user, author)
+        else:
+            trim_feed(user, *ids)
+
+
+def add_many(model, user, field, ids, exclude=()):
+    ids = list(dict.fromkeys(ids))
+    allowed = [pk for pk in ids if pk not in exclude]
+    with transaction.atomic():
+        created = (insert_many(model, user, field, allowed)
+                   if allowed else set())
+        apply_changes(model, user, created, added=True)
+        existing = set(model.objects.filter(
+            user=user, **{f'{field}__in': allowed}
+        ).values_list(field, flat=True))
+    results = []
+    for pk in ids:
+        if pk in created:
+            status = CREATED
+        elif pk in existing:
+            status = EXISTS
+        elif pk in exclude:
+            status = INVALID
+        else:
+            status = NOT_FOUND
+        results.append({'id': pk, 'status': status})
+    return results
+
+
+def remove_many(model, user, field, ids=None):
+    with transaction.atomic():
+        deleted = delete_many(model, user, field, ids)
+        apply_changes(model, user, deleted, added=False)
+    if ids is None:
+        ids = sorted(deleted)
+    return [
+        {'id': pk, 'status': DELETED if pk in deleted else NOT_FOUND}
+        for pk in dict.fromkeys(ids)
+    ]
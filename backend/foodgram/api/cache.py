@@ -0,0 +1,92 @@
+from hashlib import md5
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+
+from foodgram.settings import COUNT_CACHE_TIMEOUT
+from recipes.models import ShoppingCart
+
+CART_VERSION_KEY = 'shopping_cart_version:{}'
+SHOPPING_LIST_KEY = 'shopping_list:{}:{}:{}'
+DATA_VERSION_KEY = 'data_version:{}'
+MEMBERSHIP_VERSION_KEY = 'membership_version:{}'
+AUTH_VERSION_KEY = 'auth_version:{}'
+RESPONSE_KEY = 'response:{}:{}:{}'
+COUNT_KEY = 'count:{}:{}:{}'
+
+
+def get_version(key):
+    cache.add(key, uuid4().hex, None)
+    return cache.get(key)
+
+
+def get_cart_version(user_id):
+    return get_version(CART_VERSION_KEY.format(user_id))
+
+
+def bump_cart_version(*user_ids):
+    cache.delete_many([CART_VERSION_KEY.format(pk) for pk in user_ids])
+
+
+def get_membership_version(user_id):
+    return get_version(MEMBERSHIP_VERSION_KEY.format(user_id))
+
+
+def bump_membership_version(user_id):
+    cache.delete(MEMBERSHIP_VERSION_KEY.format(user_id))
+
+
+def get_auth_version(user_id):
+    return get_version(AUTH_VERSION_KEY.format(user_id))
+
+
+def bump_auth_version(user_id):
+    cache.delete(AUTH_VERSION_KEY.format(user_id))
+
+
+def bump_recipe_carts(*recipe_ids):
+    bump_cart_version(*ShoppingCart.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('user_id', flat=True).distinct())
+
+
+def get_shopping_list_key(user_id, format):
+    return SHOPPING_LIST_KEY.format(
+        user_id, get_cart_version(user_id), format)
+
+
+def cache_stream(key, chunks, timeout):
+    content = []
+    for chunk in chunks:
+        content.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(content), timeout)
+
+
+def get_data_version(scope):
+    return get_version(DATA_VERSION_KEY.format(scope))
+
+
+def bump_data_version(scope):
+    cache.delete(DATA_VERSION_KEY.format(scope))
+
+
+def get_response_key(scope, path):
+    return RESPONSE_KEY.format(
+        scope, get_data_version(scope), md5(path.encode()).hexdigest())
+
+
+def get_cached_count(queryset):
+    scope = queryset.model._meta.label_lower
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        return 0
+    key = COUNT_KEY.format(scope, get_data_version(scope),
+                           md5(sql.encode()).hexdigest())
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, COUNT_CACHE_TIMEOUT)
+    return count
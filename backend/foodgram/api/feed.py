@@ -0,0 +1,75 @@
+from django.db.models import Min, Q
+
+from foodgram.settings import (FEED_BACKFILL_SIZE, FEED_FANOUT_BATCH_SIZE,
+                               FEED_FANOUT_LIMIT)
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow, User
+
+
+def is_pulled(author):
+    return author.followers_count > FEED_FANOUT_LIMIT
+
+
+def fan_out_recipe(recipe):
+    if is_pulled(User.objects.get(pk=recipe.author_id)):
+        return
+    followers = Follow.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True).iterator(
+        chunk_size=FEED_FANOUT_BATCH_SIZE)
+    batch = []
+    for user_id in followers:
+        batch.append(FeedEntry(user_id=user_id, recipe_id=recipe.id,
+                               author_id=recipe.author_id))
+        if len(batch) >= FEED_FANOUT_BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def backfill_feed(user, author):
+    if is_pulled(author):
+        return
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user=user, recipe_id=recipe_id, author=author)
+         for recipe_id in author.recipes.values_list(
+             'id', flat=True)[:FEED_BACKFILL_SIZE]),
+        ignore_conflicts=True
+    )
+
+
+def trim_feed(user, *authors):
+    FeedEntry.objects.filter(user=user, author__in=authors).delete()
+
+
+def get_feed(user):
+    """Рецепты из записей ленты и рецепты авторов, читаемых при запросе.
+
+    backfill_feed копирует только FEED_BACKFILL_SIZE последних рецептов
+    автора, поэтому у авторов с большим числом рецептов всё, что не
+    новее самой старой записи ленты, тоже читается при запросе.
+    """
+    pushed = Follow.objects.filter(
+        user=user,
+        author__followers_count__lte=FEED_FANOUT_LIMIT,
+        author__recipes_count__gt=FEED_BACKFILL_SIZE
+    ).values_list('author_id', flat=True)
+    oldest = dict(FeedEntry.objects.filter(
+        user=user, author_id__in=pushed
+    ).order_by().values('author_id').annotate(
+        pub_date=Min('recipe__pub_date')
+    ).values_list('author_id', 'pub_date'))
+    older = Q()
+    for author_id in pushed:
+        if author_id in oldest:
+            older |= Q(author_id=author_id, pub_date__lte=oldest[author_id])
+        else:
+            older |= Q(author_id=author_id)
+    return Recipe.objects.filter(
+        Q(pk__in=FeedEntry.objects.filter(user=user).values('recipe_id'))
+        | Q(author__in=Follow.objects.filter(
+            user=user,
+            author__followers_count__gt=FEED_FANOUT_LIMIT
+        ).values('author_id'))
+        | older
+    )
@@ -0,0 +1,40 @@
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+
+class RecipeImageField(Base64ImageField):
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            return serializers.ImageField.to_internal_value(self, data)
+        return super().to_internal_value(data)
+
+
+class RecipeImageURLField(serializers.Field):
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def build_url(self, name, storage):
+        url = storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return None
+        request = self.context.get('request')
+        size = request and request.query_params.get('image_size')
+        name = recipe.image_variants.get(size, recipe.image.name)
+        return self.build_url(name, recipe.image.storage)
+
+
+class RecipeImageVariantsField(RecipeImageURLField):
+    def to_representation(self, recipe):
+        return {
+            size: self.build_url(name, recipe.image.storage)
+            for size, name in recipe.image_variants.items()
+        }
@@ -1,18 +1,37 @@
+from django.db.models import Case, IntegerField, Value, When
 from django_filters import rest_framework as filters
 
+from foodgram.settings import INGREDIENT_SEARCH_LIMIT
 from recipes.models import Ingredient, Recipe, Tag
+from .membership import membership_cache
+from .pantry import match_pantry
+from .search import search_recipes
 
 
 class IngredientFilter(filters.FilterSet):
     name = filters.CharFilter(
-        field_name='name',
-        lookup_expr='istartswith',
+        method='get_name'
     )
 
     class Meta:
         model = Ingredient
         fields = ('name',)
 
+    def get_name(self, queryset, name, value):
+        return queryset.filter(name__icontains=value).annotate(
+            match=Case(
+                When(name__iexact=value, then=Value(0)),
+                When(name__istartswith=value, then=Value(1)),
+                default=Value(2),
+                output_field=IntegerField(),
+            )
+        ).order_by('match', 'name', 'measurement_unit')[
+            :INGREDIENT_SEARCH_LIMIT]
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
 
 class RecipeFilter(filters.FilterSet):
     tags = filters.ModelMultipleChoiceFilter(
@@ -26,17 +45,46 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    search = filters.CharFilter(
+        method='get_search'
+    )
+    have = NumberInFilter(
+        method='get_have'
+    )
+    max_missing = filters.NumberFilter(
+        method='get_max_missing',
+        min_value=0
+    )
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'search', 'have', 'max_missing')
 
     def get_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(in_favorited__user=self.request.user)
+            return queryset.filter(
+                pk__in=membership_cache.get(self.request.user).favorites)
         return queryset
 
     def get_is_in_shopping_cart(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
-            return queryset.filter(shopping_cart__user=self.request.user)
+            return queryset.filter(
+                pk__in=membership_cache.get(self.request.user).shopping_cart)
+        return queryset
+
+    def get_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def get_have(self, queryset, name, value):
+        max_missing = self.form.cleaned_data.get('max_missing')
+        candidates = None
+        if queryset.query.has_filters():
+            candidates = queryset.values_list('pk', flat=True)
+        return match_pantry(
+            queryset, [int(pk) for pk in value],
+            None if max_missing is None else int(max_missing),
+            candidates)
+
+    def get_max_missing(self, queryset, name, value):
         return queryset
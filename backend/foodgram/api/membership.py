@@ -0,0 +1,72 @@
+import threading
+from collections import OrderedDict, namedtuple
+from time import monotonic
+
+from foodgram.settings import MEMBERSHIP_CACHE_SIZE, MEMBERSHIP_CACHE_TTL
+from recipes.models import Favorite, ShoppingCart
+from .cache import get_membership_version
+
+Membership = namedtuple('Membership', ('favorites', 'shopping_cart'))
+EMPTY_MEMBERSHIP = Membership(frozenset(), frozenset())
+FIELDS = {Favorite: 'favorites', ShoppingCart: 'shopping_cart'}
+
+
+class MembershipCache:
+    """LRU-кэш id рецептов в избранном и в корзине пользователя.
+
+    Записи ограничены по количеству и времени жизни; запись из другого
+    воркера сбрасывает версию в общем кэше, и множество перечитывается.
+    """
+
+    def __init__(self, maxsize=MEMBERSHIP_CACHE_SIZE,
+                 ttl=MEMBERSHIP_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user):
+        if not user.is_authenticated:
+            return EMPTY_MEMBERSHIP
+        version = get_membership_version(user.id)
+        with self._lock:
+            entry = self._entries.get(user.id)
+            if (entry is not None and entry['version'] == version
+                    and monotonic() < entry['expires']):
+                self._entries.move_to_end(user.id)
+                return entry['membership']
+        membership = Membership(
+            favorites=frozenset(Favorite.objects.filter(
+                user=user).values_list('recipe_id', flat=True)),
+            shopping_cart=frozenset(ShoppingCart.objects.filter(
+                user=user).values_list('recipe_id', flat=True)),
+        )
+        self.store(user.id, membership, version)
+        return membership
+
+    def store(self, user_id, membership, version):
+        with self._lock:
+            self._entries[user_id] = {
+                'membership': membership,
+                'version': version,
+                'expires': monotonic() + self.ttl,
+            }
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def update(self, user_id, model_class, recipe_ids, added):
+        with self._lock:
+            entry = self._entries.get(user_id)
+        if entry is None:
+            return
+        field = FIELDS[model_class]
+        current = getattr(entry['membership'], field)
+        current = (current.union(recipe_ids) if added
+                   else current.difference(recipe_ids))
+        self.store(user_id,
+                   entry['membership']._replace(**{field: current}),
+                   get_membership_version(user_id))
+
+
+membership_cache = MembershipCache()
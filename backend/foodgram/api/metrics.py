@@ -0,0 +1,123 @@
+import heapq
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from foodgram.settings import (METRICS_LATENCY_BUCKETS, METRICS_QUERY_BUCKETS,
+                               METRICS_SLOW_SQL_COUNT)
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+class Histogram:
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, view, value):
+        with self._lock:
+            series = self._series.setdefault(
+                view, {'counts': [0] * len(self.buckets), 'sum': 0.0,
+                       'count': 0})
+            position = bisect_left(self.buckets, value)
+            if position < len(self.buckets):
+                series['counts'][position] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}',
+                 f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {view: {**data, 'counts': list(data['counts'])}
+                      for view, data in self._series.items()}
+        for view, data in sorted(series.items()):
+            total = 0
+            for bound, count in zip(self.buckets, data['counts']):
+                total += count
+                lines.append(
+                    f'{self.name}_bucket{{view="{view}",le="{bound}"}} '
+                    f'{total}')
+            lines.append(f'{self.name}_bucket{{view="{view}",le="+Inf"}} '
+                         f'{data["count"]}')
+            lines.append(f'{self.name}_sum{{view="{view}"}} {data["sum"]}')
+            lines.append(f'{self.name}_count{{view="{view}"}} '
+                         f'{data["count"]}')
+        return lines
+
+
+HISTOGRAMS = {
+    'total': Histogram('foodgram_request_duration_seconds',
+                       'Время обработки запроса.', METRICS_LATENCY_BUCKETS),
+    'db': Histogram('foodgram_db_duration_seconds',
+                    'Время SQL-запросов за запрос.', METRICS_LATENCY_BUCKETS),
+    'serialize': Histogram('foodgram_serializer_duration_seconds',
+                           'Время сериализации ответа в JSON.',
+                           METRICS_LATENCY_BUCKETS),
+    'queries': Histogram('foodgram_db_queries',
+                         'Количество SQL-запросов за запрос.',
+                         METRICS_QUERY_BUCKETS),
+}
+
+
+def render_metrics():
+    lines = []
+    for histogram in HISTOGRAMS.values():
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    """Счётчики одного запроса; подключается как execute_wrapper."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.slowest = []
+        self._serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - start
+            self.queries += 1
+            self.db_time += duration
+            item = (duration, self.queries, sql)
+            if len(self.slowest) < METRICS_SLOW_SQL_COUNT:
+                heapq.heappush(self.slowest, item)
+            else:
+                heapq.heappushpop(self.slowest, item)
+
+    @contextmanager
+    def serializing(self):
+        if self._serializing:
+            yield
+            return
+        self._serializing = True
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.serialize_time += perf_counter() - start
+            self._serializing = False
+
+    def observe(self, view, total):
+        HISTOGRAMS['total'].observe(view, total)
+        HISTOGRAMS['db'].observe(view, self.db_time)
+        HISTOGRAMS['serialize'].observe(view, self.serialize_time)
+        HISTOGRAMS['queries'].observe(view, self.queries)
+
+    def server_timing(self, total):
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} SQL"',
+            f'serialize;dur={self.serialize_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
@@ -0,0 +1,186 @@
+import logging
+import random
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from time import perf_counter
+
+from django.db import connection
+from django.urls import Resolver404, resolve
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from foodgram.settings import (METRICS_SLOW_QUERIES, METRICS_SLOW_REQUEST,
+                               PROFILER_SAMPLE_RATES)
+from .metrics import RequestMetrics, current_metrics
+from .profiler import (CProfiler, SamplingProfiler, create_report,
+                       finish_report, save_report)
+
+logger = logging.getLogger(__name__)
+SQL_LOG_LENGTH = 1000
+
+
+def get_view_name(request, match=None):
+    match = match or getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view = getattr(match.func, 'cls', None)
+    if view is None:
+        return match.view_name or match._func_path
+    action = (getattr(match.func, 'actions', None) or {}).get(
+        request.method.lower())
+    return f'{view.__name__}.{action}' if action else view.__name__
+
+
+@contextmanager
+def measuring(metrics):
+    token = current_metrics.set(metrics)
+    try:
+        with connection.execute_wrapper(metrics):
+            yield
+    finally:
+        current_metrics.reset(token)
+
+
+class WrappedStream:
+    """Отдаёт части ответа внутри context и вызывает finish в конце.
+
+    finish срабатывает один раз: при исчерпании потока или при его
+    закрытии сервером, даже если тело так и не начали читать.
+    """
+
+    def __init__(self, content, context, finish):
+        self.iterator = iter(content)
+        self.context = context
+        self.finish = finish
+        self.finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            with self.context():
+                return next(self.iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self.finished:
+            return
+        self.finished = True
+        try:
+            if hasattr(self.iterator, 'close'):
+                self.iterator.close()
+        finally:
+            self.finish()
+
+
+class MetricsMiddleware:
+    """Собирает число и время SQL-запросов, время сериализации и ответа.
+
+    Для потоковых ответов метрики учитываются после отдачи тела, а
+    Server-Timing не выставляется: заголовки уходят раньше тела.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        start = perf_counter()
+        with measuring(metrics):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = WrappedStream(
+                response.streaming_content,
+                partial(measuring, metrics),
+                partial(self.finish, request, metrics, start))
+            return response
+        total = self.finish(request, metrics, start)
+        response['Server-Timing'] = metrics.server_timing(total)
+        return response
+
+    def finish(self, request, metrics, start):
+        total = perf_counter() - start
+        view = get_view_name(request)
+        metrics.observe(view, total)
+        if (metrics.queries > METRICS_SLOW_QUERIES
+                or total > METRICS_SLOW_REQUEST):
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.0f мс, SQL: %s за %.0f мс.'
+                '\nСамые долгие запросы:\n%s',
+                request.method, request.get_full_path(), view,
+                total * 1000, metrics.queries, metrics.db_time * 1000,
+                '\n'.join(f'{duration * 1000:.1f} мс: {sql[:SQL_LOG_LENGTH]}'
+                          for duration, _, sql in sorted(
+                              metrics.slowest, reverse=True))
+            )
+        return total
+
+
+def is_staff(request):
+    if request.user.is_staff:
+        return True
+    api_request = Request(request, authenticators=[
+        authenticator() for authenticator
+        in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    ])
+    try:
+        return api_request.user.is_staff
+    except APIException:
+        return False
+
+
+class ProfilerMiddleware:
+    """Профилирование запроса по флагу staff-пользователя или 1 из N.
+
+    Флаг: заголовок X-Profile или параметр ?profile=; значение sample
+    включает сэмплирующий профилировщик вместо cProfile.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            match = resolve(request.path_info,
+                            getattr(request, 'urlconf', None))
+        except Resolver404:
+            return self.get_response(request)
+        view = get_view_name(request, match)
+        flag = request.headers.get(
+            'X-Profile', request.GET.get('profile'))
+        sampled = False
+        if flag and is_staff(request):
+            profiler = (SamplingProfiler() if flag == 'sample'
+                        else CProfiler())
+        else:
+            rate = PROFILER_SAMPLE_RATES.get(view)
+            if not rate or random.randrange(rate):
+                return self.get_response(request)
+            profiler, sampled = SamplingProfiler(), True
+        start = perf_counter()
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            profiler.stop()
+            raise
+        if response.streaming:
+            report = create_report(profiler, request, view, sampled)
+            response.streaming_content = WrappedStream(
+                response.streaming_content, nullcontext,
+                partial(self.finish, profiler, report, start))
+        else:
+            profiler.stop()
+            report = save_report(profiler, request, view,
+                                 perf_counter() - start, sampled)
+        if not sampled:
+            response['X-Profile-Report'] = str(report.pk)
+        return response
+
+    def finish(self, profiler, report, start):
+        profiler.stop()
+        finish_report(profiler, report, perf_counter() - start)
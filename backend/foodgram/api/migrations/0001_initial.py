@@ -0,0 +1,32 @@
+# Generated by Django 3.2 on 2026-10-18 12:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProfileReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view', models.CharField(max_length=255, verbose_name='Представление')),
+                ('path', models.CharField(max_length=2048, verbose_name='Адрес запроса')),
+                ('mode', models.CharField(choices=[('cprofile', 'cProfile'), ('sampling', 'Сэмплирование')], max_length=16, verbose_name='Режим')),
+                ('sampled', models.BooleanField(default=False, verbose_name='Случайная выборка')),
+                ('duration', models.FloatField(verbose_name='Длительность, мс')),
+                ('file', models.CharField(max_length=255, verbose_name='Файл')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ('-created',),
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+import gzip
+from hashlib import sha1
+
+import brotli
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from foodgram.settings import RESPONSE_CACHE_TIMEOUT
+from .cache import get_response_key
+from .renderers import MeasuredJSONRenderer
+
+ENCODINGS = (
+    ('br', brotli.compress),
+    ('gzip', gzip.compress),
+)
+
+
+class CachedResponseMixin:
+    """Отдаёт list/retrieve из кэша, версия которого сбрасывается сигналами.
+
+    Тело хранится вместе с заранее сжатыми br/gzip-копиями и ETag,
+    по If-None-Match отвечает 304.
+    """
+    cache_scope = None
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request,
+                                        *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(super().retrieve, request,
+                                        *args, **kwargs)
+
+    def get_cached_response(self, view, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return view(request, *args, **kwargs)
+        key = get_response_key(self.cache_scope, request.get_full_path())
+        entry = cache.get(key)
+        if entry is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            body = MeasuredJSONRenderer().render(response.data)
+            entry = {'identity': body, 'etag': f'"{sha1(body).hexdigest()}"'}
+            for encoding, compress in ENCODINGS:
+                entry[encoding] = compress(body)
+            cache.set(key, entry, RESPONSE_CACHE_TIMEOUT)
+
+        if entry['etag'] in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            accepted = request.headers.get('Accept-Encoding', '')
+            encoding = next(
+                (encoding for encoding, _ in ENCODINGS
+                 if encoding in accepted), 'identity')
+            response = HttpResponse(entry[encoding],
+                                    content_type='application/json')
+            if encoding != 'identity':
+                response['Content-Encoding'] = encoding
+        response['ETag'] = entry['etag']
+        response['Cache-Control'] = 'no-cache'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
@@ -0,0 +1,47 @@
+from django.db import models
+
+
+class ProfileReport(models.Model):
+    CPROFILE = 'cprofile'
+    SAMPLING = 'sampling'
+    MODES = (
+        (CPROFILE, 'cProfile'),
+        (SAMPLING, 'Сэмплирование'),
+    )
+
+    view = models.CharField(
+        'Представление',
+        max_length=255
+    )
+    path = models.CharField(
+        'Адрес запроса',
+        max_length=2048
+    )
+    mode = models.CharField(
+        'Режим',
+        max_length=16,
+        choices=MODES
+    )
+    sampled = models.BooleanField(
+        'Случайная выборка',
+        default=False
+    )
+    duration = models.FloatField(
+        'Длительность, мс'
+    )
+    file = models.CharField(
+        'Файл',
+        max_length=255
+    )
+    created = models.DateTimeField(
+        'Создано',
+        auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        ordering = ('-created',)
+
+    def __str__(self):
+        return f'{self.view} ({self.duration:.0f} мс)'
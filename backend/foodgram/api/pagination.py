@@ -1,5 +1,79 @@
-from rest_framework.pagination import PageNumberPagination
+from collections import OrderedDict
+
+from django.core.paginator import Paginator as DjangoPaginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+
+from .cache import get_cached_count
+
+
+class CachedCountPaginator(DjangoPaginator):
+    @cached_property
+    def count(self):
+        return get_cached_count(self.object_list)
 
 
 class LimitPageNumberPaginator(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class CachedCountPageNumberPaginator(LimitPageNumberPaginator):
+    django_paginator_class = CachedCountPaginator
+
+
+class RecipeCursorPaginator(CursorPagination):
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = 'limit'
+
+    def get_ordering(self, request, queryset, view):
+        """Выдача, упорядоченная по релевантности, сохраняет порядок."""
+        ordering = queryset.query.order_by
+        if ordering and ordering[0].lstrip('-') in queryset.query.annotations:
+            return tuple(ordering)
+        return super().get_ordering(request, queryset, view)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = get_cached_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class RecipePaginator(BasePagination):
+    """Курсорная пагинация по ?cursor= или ?pagination=cursor,
+    иначе постраничная с кэшированным количеством."""
+
+    def __init__(self):
+        self.cursor_paginator = RecipeCursorPaginator()
+        self.page_paginator = CachedCountPageNumberPaginator()
+        self.paginator = self.page_paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (request.query_params.get('cursor')
+                or request.query_params.get('pagination') == 'cursor'):
+            self.paginator = self.cursor_paginator
+        else:
+            self.paginator = self.page_paginator
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_paginator.get_paginated_response_schema(schema)
+
+    def get_schema_fields(self, view):
+        return (self.page_paginator.get_schema_fields(view)
+                + self.cursor_paginator.get_schema_fields(view))
+
+    def get_schema_operation_parameters(self, view):
+        return (self.page_paginator.get_schema_operation_parameters(view)
+                + self.cursor_paginator.get_schema_operation_parameters(view))
@@ -0,0 +1,103 @@
+import threading
+from itertools import chain
+
+import numpy as np
+
+from foodgram.settings import PANTRY_LOAD_CHUNK_SIZE, PANTRY_MAX_RESULTS
+from recipes.changes import get_recipe_changes
+from recipes.models import RecipeIngredient
+from .utils import order_by_scores
+
+
+class PantryIndex:
+    """Инвертированный индекс ингредиент -> рецепты для подбора по продуктам.
+
+    Состав рецептов хранится в памяти воркера массивами numpy в формате
+    CSR: id рецептов, число ингредиентов каждого и их id подряд. Массивы
+    обновляются по журналу изменений в базе, а обратный индекс
+    пересобирается только после изменений.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = None
+        self._recipe_ids = np.empty(0, dtype=np.int64)
+        self._counts = np.empty(0, dtype=np.int64)
+        self._ingredients = np.empty(0, dtype=np.int32)
+        self._arrays = None
+
+    def load(self, recipe_ids=None):
+        queryset = RecipeIngredient.objects.order_by()
+        if recipe_ids is not None:
+            queryset = queryset.filter(recipe_id__in=recipe_ids)
+        rows = np.fromiter(chain.from_iterable(
+            queryset.values_list('recipe_id', 'ingredient_id').iterator(
+                chunk_size=PANTRY_LOAD_CHUNK_SIZE)
+        ), dtype=np.int64).reshape(-1, 2)
+        rows = rows[np.argsort(rows[:, 0], kind='stable')]
+        recipe_ids, counts = np.unique(rows[:, 0], return_counts=True)
+        return recipe_ids, counts, rows[:, 1].astype(np.int32)
+
+    def refresh(self):
+        seq, changed = get_recipe_changes(self._seq)
+        if changed is None:
+            self._recipe_ids, self._counts, self._ingredients = self.load()
+        elif changed:
+            keep = ~np.isin(self._recipe_ids, list(changed))
+            recipe_ids, counts, ingredients = self.load(changed)
+            self._ingredients = np.concatenate((
+                self._ingredients[np.repeat(keep, self._counts)],
+                ingredients))
+            self._recipe_ids = np.concatenate(
+                (self._recipe_ids[keep], recipe_ids))
+            self._counts = np.concatenate((self._counts[keep], counts))
+        self._seq = seq
+        if changed is None or changed:
+            self._arrays = None
+
+    def build_arrays(self):
+        """Позиции рецептов, отсортированные по id ингредиента."""
+        positions = np.repeat(
+            np.arange(len(self._recipe_ids), dtype=np.int32), self._counts)
+        order = np.argsort(self._ingredients, kind='stable')
+        return (self._recipe_ids, self._counts, self._ingredients[order],
+                positions[order])
+
+    def match(self, ingredient_ids, max_missing=None, candidates=None,
+              limit=PANTRY_MAX_RESULTS):
+        """Лучшие по покрытию рецепты; candidates сужает выбор до лимита."""
+        with self._lock:
+            self.refresh()
+            if self._arrays is None:
+                self._arrays = self.build_arrays()
+            recipe_ids, totals, ingredients, postings = self._arrays
+        query = np.unique(np.fromiter(ingredient_ids, dtype=np.int64))
+        starts = np.searchsorted(ingredients, query, 'left')
+        ends = np.searchsorted(ingredients, query, 'right')
+        hits = [postings[start:end]
+                for start, end in zip(starts, ends) if end > start]
+        if not hits:
+            return {}
+        matched = np.bincount(np.concatenate(hits), minlength=len(totals))
+        allowed = matched > 0
+        if max_missing is not None:
+            allowed &= totals - matched <= max_missing
+        if candidates is not None:
+            allowed &= np.isin(recipe_ids, np.fromiter(candidates, np.int64))
+        positions = np.flatnonzero(allowed)
+        coverage = matched[positions] / totals[positions]
+        best = positions[np.lexsort(
+            (-recipe_ids[positions], -coverage))][:limit]
+        return dict(zip(recipe_ids[best].tolist(),
+                        (matched[best] / totals[best]).tolist()))
+
+
+pantry_index = PantryIndex()
+
+
+def match_pantry(queryset, ingredient_ids, max_missing=None,
+                 candidates=None):
+    return order_by_scores(
+        queryset,
+        pantry_index.match(ingredient_ids, max_missing, candidates),
+        'coverage')
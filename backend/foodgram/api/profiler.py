@@ -0,0 +1,103 @@
+import cProfile
+import os
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from uuid import uuid4
+
+from foodgram.settings import (PROFILER_DIR, PROFILER_INTERVAL,
+                               PROFILER_MAX_REPORTS)
+from .models import ProfileReport
+
+
+class CProfiler:
+    mode = ProfileReport.CPROFILE
+    extension = 'prof'
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def dump(self, path):
+        self.profile.dump_stats(path)
+
+
+class SamplingProfiler:
+    """Раз в interval секунд снимает стек потока запроса.
+
+    Результат сохраняется в формате collapsed stacks для flamegraph.
+    """
+
+    mode = ProfileReport.SAMPLING
+    extension = 'txt'
+
+    def __init__(self, interval=PROFILER_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f'{frame.f_globals.get("__name__", "?")}:'
+                             f'{frame.f_code.co_name}')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, 'w') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+
+def create_report(profiler, request, view, sampled):
+    name = (f'{datetime.now():%Y%m%d-%H%M%S}-{view}-{uuid4().hex[:8]}.'
+            f'{profiler.extension}')
+    return ProfileReport.objects.create(
+        view=view,
+        path=request.get_full_path()[:2048],
+        mode=profiler.mode,
+        sampled=sampled,
+        duration=0,
+        file=name,
+    )
+
+
+def finish_report(profiler, report, duration):
+    os.makedirs(PROFILER_DIR, exist_ok=True)
+    profiler.dump(os.path.join(PROFILER_DIR, report.file))
+    report.duration = duration * 1000
+    report.save(update_fields=['duration'])
+    for stale in ProfileReport.objects.all()[PROFILER_MAX_REPORTS:]:
+        stale.delete()
+    return report
+
+
+def save_report(profiler, request, view, duration, sampled):
+    return finish_report(
+        profiler, create_report(profiler, request, view, sampled), duration)
+
+
+def delete_report_file(name):
+    try:
+        os.remove(os.path.join(PROFILER_DIR, name))
+    except FileNotFoundError:
+        pass
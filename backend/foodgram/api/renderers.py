@@ -0,0 +1,142 @@
+import csv
+import json
+from io import BytesIO
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from rest_framework import renderers
+
+from foodgram.settings import PDF_FONT
+from .metrics import current_metrics
+
+
+class MeasuredJSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer, учитывающий время рендеринга в метриках запроса."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+        with metrics.serializing():
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(renderers.BaseRenderer):
+    charset = 'utf-8'
+    streaming = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return json.dumps(data, ensure_ascii=False).encode(self.charset)
+        return b''.join(self.stream(data))
+
+    def stream(self, rows):
+        raise NotImplementedError
+
+    @staticmethod
+    def line(row):
+        return (f"{row['ingredient__name']} "
+                f"({row['ingredient__measurement_unit']}) "
+                f"— {row['total_amount']}")
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        separator = ''
+        for row in rows:
+            yield f'{separator}{self.line(row)}'.encode(self.charset)
+            separator = '\n'
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ['name', 'measurement_unit', 'amount']).encode(self.charset)
+        for row in rows:
+            yield writer.writerow([
+                row['ingredient__name'],
+                row['ingredient__measurement_unit'],
+                row['total_amount'],
+            ]).encode(self.charset)
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, rows):
+        separator = '['
+        for row in rows:
+            item = json.dumps({
+                'name': row['ingredient__name'],
+                'measurement_unit': row['ingredient__measurement_unit'],
+                'amount': row['total_amount'],
+            }, ensure_ascii=False)
+            yield f'{separator}{item}'.encode(self.charset)
+            separator = ','
+        yield b'[]' if separator == '[' else b']'
+
+
+class ShoppingListPDFRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    streaming = False
+    font_name = 'ShoppingListFont'
+    font_size = 12
+    margin = 50
+
+    def stream(self, rows):
+        """Документ собирается целиком: reportlab пишет PDF в конце."""
+        if self.font_name not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(self.font_name, PDF_FONT))
+        buffer = BytesIO()
+        document = canvas.Canvas(buffer, pagesize=A4)
+        width, height = A4
+        position = height - self.margin
+        document.setFont(self.font_name, self.font_size)
+        for row in rows:
+            if position < self.margin:
+                document.showPage()
+                document.setFont(self.font_name, self.font_size)
+                position = height - self.margin
+            document.drawString(self.margin, position,
+                                self.line(row))
+            position -= self.font_size * 1.5
+        document.save()
+        yield buffer.getvalue()
+
+
+SHOPPING_LIST_RENDERERS = (
+    ShoppingListTextRenderer,
+    ShoppingListCSVRenderer,
+    ShoppingListJSONRenderer,
+    ShoppingListPDFRenderer,
+)
+
+
+class PrometheusRenderer(renderers.BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            return json.dumps(data, ensure_ascii=False).encode(self.charset)
+        return data.encode(self.charset)
@@ -0,0 +1,186 @@
+import re
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import close_old_connections, connection
+from django.db.models import F, OuterRef, Subquery
+
+from foodgram.settings import INGREDIENT_NGRAM_SIZE, SEARCH_CONFIG
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from .cache import get_data_version
+from .utils import order_by_scores
+
+SEARCH_WEIGHTS = {'name': 1.0, 'ingredients': 0.4, 'text': 0.2}
+
+
+def get_grams(key):
+    return {key[start:start + size]
+            for size in range(1, INGREDIENT_NGRAM_SIZE + 1)
+            for start in range(len(key) - size + 1)}
+
+
+class IngredientPrefixIndex:
+    """Отсортированный in-memory индекс ингредиентов для автодополнения.
+
+    Привязан к версии данных ингредиентов в общем кэше: изменение в любом
+    воркере делает индекс устаревшим во всех. Версия запоминается до
+    чтения строк, поэтому изменение во время сборки оставляет индекс
+    устаревшим, и он собирается заново. Подстроки ищутся по индексу
+    n-грамм, без прохода по всем названиям.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._version = None
+        self._keys = []
+        self._items = []
+        self._grams = {}
+
+    @property
+    def is_warm(self):
+        return self._version == get_data_version('ingredients')
+
+    def build(self):
+        version = get_data_version('ingredients')
+        rows = sorted(
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit'),
+            key=lambda row: (row[1].casefold(), row[2])
+        )
+        items = [
+            Ingredient(id=pk, name=name, measurement_unit=unit)
+            for pk, name, unit in rows
+        ]
+        keys = [item.name.casefold() for item in items]
+        grams = defaultdict(list)
+        for position, key in enumerate(keys):
+            for gram in get_grams(key):
+                grams[gram].append(position)
+        with self._lock:
+            self._keys, self._items = keys, items
+            self._grams = dict(grams)
+            self._version = version
+
+    def warm_up(self):
+        if self._build_lock.locked():
+            return
+        threading.Thread(target=self._build_in_background,
+                         daemon=True).start()
+
+    def _build_in_background(self):
+        try:
+            with self._build_lock:
+                if not self.is_warm:
+                    self.build()
+        finally:
+            close_old_connections()
+
+    def search(self, name, limit):
+        with self._lock:
+            keys, items, grams = self._keys, self._items, self._grams
+        query = name.casefold()
+        found = []
+        for position in range(bisect_left(keys, query), len(keys)):
+            if len(found) >= limit or not keys[position].startswith(query):
+                break
+            found.append(items[position])
+        if len(found) < limit and query:
+            size = min(INGREDIENT_NGRAM_SIZE, len(query))
+            positions = min(
+                (grams.get(query[start:start + size], ())
+                 for start in range(len(query) - size + 1)),
+                key=len)
+            for position in positions:
+                key = keys[position]
+                if query in key and not key.startswith(query):
+                    found.append(items[position])
+                    if len(found) >= limit:
+                        break
+        return found
+
+
+ingredient_index = IngredientPrefixIndex()
+
+
+def tokenize(text):
+    return re.findall(r'\w+', text.casefold())
+
+
+def search_vector_expression(recipe_ingredients=RecipeIngredient.objects):
+    ingredients = Subquery(
+        recipe_ingredients.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(ingredients, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset):
+    if connection.vendor == 'postgresql':
+        queryset.update(search_vector=search_vector_expression())
+
+
+class RecipeSearchIndex:
+    """Инвертированный индекс рецептов для баз без полнотекстового поиска.
+
+    Перестраивается, когда меняется версия данных рецептов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._postings = {}
+
+    def build(self):
+        postings = defaultdict(lambda: defaultdict(float))
+        for pk, name, text in Recipe.objects.values_list(
+                'pk', 'name', 'text'):
+            for field, value in (('name', name), ('text', text)):
+                for token in tokenize(value):
+                    postings[token][pk] += SEARCH_WEIGHTS[field]
+        for pk, name in RecipeIngredient.objects.values_list(
+                'recipe_id', 'ingredient__name'):
+            for token in tokenize(name):
+                postings[token][pk] += SEARCH_WEIGHTS['ingredients']
+        return {token: dict(scores) for token, scores in postings.items()}
+
+    def search(self, value):
+        version = (get_data_version(Recipe._meta.label_lower),
+                   get_data_version('ingredients'))
+        with self._lock:
+            if self._version != version:
+                self._postings = self.build()
+                self._version = version
+            postings = self._postings
+        scores = None
+        for token in set(tokenize(value)):
+            matches = postings.get(token, {})
+            if scores is None:
+                scores = dict(matches)
+            else:
+                scores = {pk: scores[pk] + score
+                          for pk, score in matches.items() if pk in scores}
+        return scores or {}
+
+
+recipe_search_index = RecipeSearchIndex()
+
+
+def search_recipes(queryset, value):
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(value, config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-pub_date')
+    return order_by_scores(
+        queryset, recipe_search_index.search(value), 'rank')
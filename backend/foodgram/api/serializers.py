@@ -1,13 +1,25 @@
+import json
+
+from django.db import transaction
+from django.http import QueryDict
 from django.shortcuts import get_object_or_404
 from django.core.exceptions import ValidationError
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 from djoser.serializers import UserSerializer, UserCreateSerializer
-
-from api.utils import get_subscribed, create_recipe_ingredient
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from api.authentication import USER_CLAIMS
+from api.fields import (RecipeImageField, RecipeImageURLField,
+                        RecipeImageVariantsField)
+from api.utils import (create_recipe_ingredient, get_subscribed,
+                       update_recipe_ingredient)
+from foodgram.settings import BATCH_MAX_SIZE, RECIPE_DUPLICATE_THRESHOLD
+from recipes.images import replace_recipe_image
+from recipes.minhash import find_similar, get_signature
 from recipes.models import (Favorite,
                             Ingredient,
                             Recipe,
+                            RecipeImageJob,
                             RecipeIngredient,
                             ShoppingCart,
                             Tag)
@@ -54,6 +66,23 @@ class UserPostSerializer(UserCreateSerializer):
         return user
 
 
+class StatelessTokenObtainSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        return token
+
+
+class BatchSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BATCH_MAX_SIZE
+    )
+
+
 class ChangePasswordSerializer(serializers.ModelSerializer):
     current_password = serializers.CharField()
     new_password = serializers.CharField()
@@ -78,20 +107,21 @@ class ChangePasswordSerializer(serializers.ModelSerializer):
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
-    image = Base64ImageField(read_only=True)
+    image = RecipeImageURLField()
+    image_variants = RecipeImageVariantsField()
     name = serializers.ReadOnlyField()
     cooking_time = serializers.ReadOnlyField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class FollowSerializer(serializers.ModelSerializer):
     email = serializers.ReadOnlyField()
     username = serializers.ReadOnlyField()
     recipes = ShortRecipeSerializer(many=True, read_only=True)
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -104,9 +134,6 @@ class FollowSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         return get_subscribed(obj, request)
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
 
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
@@ -151,20 +178,29 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     author = UserGetSerializer(read_only=True)
-    image = Base64ImageField(required=True, allow_null=True)
+    image = RecipeImageURLField()
+    image_variants = RecipeImageVariantsField()
 
     class Meta:
         model = Recipe
         fields = ['id', 'tags', 'author', 'ingredients', 'is_favorited',
-                  'is_in_shopping_cart', 'name', 'image',
+                  'is_in_shopping_cart', 'name', 'image', 'image_variants',
                   'text', 'cooking_time']
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        if 'membership' in self.context:
+            return obj.pk in self.context['membership'].favorites
         request = self.context.get('request')
         return request.user.is_authenticated and Favorite.objects.filter(
             recipe=obj, user=request.user).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        if 'membership' in self.context:
+            return obj.pk in self.context['membership'].shopping_cart
         request = self.context.get('request')
         return request.user.is_authenticated and ShoppingCart.objects.filter(
             recipe=obj, user=request.user).exists()
@@ -178,18 +214,6 @@ class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
         model = RecipeIngredient
         fields = ('id', 'amount')
 
-    def validate(self, data):
-        request = self.context.get('request')
-        recipe_id = request.GET.get('recipe')
-        ingredient_id = data['ingredient']['id']
-        existing_ingredients = RecipeIngredient.objects.filter(
-            recipe_id=recipe_id,
-            ingredient_id=ingredient_id
-        )
-        if existing_ingredients.exists():
-            raise ValidationError('Ингредиент уже добавлен в рецепт')
-        return data
-
 
 class RecipePostUpdateSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientCreateSerializer(many=True)
@@ -197,57 +221,99 @@ class RecipePostUpdateSerializer(serializers.ModelSerializer):
         queryset=Tag.objects.all(),
         many=True)
     author = UserGetSerializer(read_only=True)
-    image = Base64ImageField(required=True, allow_null=False)
+    image = RecipeImageField(required=True, allow_null=False)
 
     class Meta:
         model = Recipe
         fields = ['id', 'ingredients', 'tags', 'author',
                   'name', 'image', 'text', 'cooking_time']
 
+    def to_internal_value(self, data):
+        if isinstance(data, QueryDict):
+            multipart_data = data.dict()
+            if 'tags' in data:
+                multipart_data['tags'] = data.getlist('tags')
+            try:
+                multipart_data['ingredients'] = json.loads(
+                    multipart_data['ingredients'])
+            except (KeyError, ValueError):
+                pass
+            data = multipart_data
+        return super().to_internal_value(data)
+
     def validate(self, data):
-        ingredients_list = []
-        ingredients_data = data.get('ingredients')
+        if 'ingredients' in data:
+            self.validate_ingredients_data(data['ingredients'])
         cooking_time = data.get('cooking_time')
-        tags = data.get('tags')
-        for ingredient in data.get('ingredients'):
+        if cooking_time is not None and cooking_time <= 0:
+            raise ValidationError(
+                'Время приготовления должно быть больше 0.')
+        if 'tags' in data and not data['tags']:
+            raise ValidationError('Необходимо указать теги.')
+        if self.instance is None:
+            self.validate_duplicate(data)
+        return data
+
+    def validate_duplicate(self, data):
+        signature = get_signature(
+            item['ingredient']['id'] for item in data['ingredients'])
+        if find_similar(signature, RECIPE_DUPLICATE_THRESHOLD,
+                        Recipe.objects.filter(
+                            author=self.context['request'].user,
+                            name__iexact=data['name'])):
+            raise ValidationError(
+                'У вас уже есть рецепт с таким названием и составом.')
+
+    def validate_ingredients_data(self, ingredients_data):
+        ingredients_list = []
+        for ingredient in ingredients_data:
             if ingredient.get('amount') <= 0:
                 raise ValidationError(
                     'Количество ингредиента не может быть меньше 1'
                 )
             ingredients_list.append(ingredient.get('ingredient')['id'])
-        if len(set(ingredients_list)) != len(ingredients_list):
-            raise ValidationError(
-                'В рецепт нельзя добавить одинаковые ингредиенты!'
-                'Следует увеличить количество текущего ингредиента!'
-            )
-        if not ingredients_data or len(ingredients_data) < 1:
+        if not ingredients_list:
             raise ValidationError(
                 "Рецепт должен содержать хотя бы один ингредиент.")
-        if cooking_time <= 0:
+        unknown_ingredients = set(ingredients_list) - set(
+            Ingredient.objects.in_bulk(ingredients_list))
+        if unknown_ingredients:
             raise ValidationError(
-                'Время приготовления должно быть больше 0.')
-        if not tags:
-            raise ValidationError('Необходимо указать теги.')
-        return data
+                'Ингредиенты не найдены: '
+                + ', '.join(map(str, sorted(unknown_ingredients)))
+            )
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         tags_data = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         create_recipe_ingredient(recipe, ingredients_data)
         recipe.tags.set(tags_data)
+        RecipeImageJob.objects.create(recipe=recipe, image=recipe.image.name)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients_data = validated_data.pop('ingredients', [])
-        tags_data = validated_data.pop('tags', [])
-        instance = super().update(instance, validated_data)
-        instance.ingredient_recipe.all().delete()
-        create_recipe_ingredient(instance, ingredients_data)
-        instance.tags.set(tags_data)
+        ingredients_data = validated_data.pop('ingredients', None)
+        tags_data = validated_data.pop('tags', None)
+        image = validated_data.pop('image', None)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        instance.save(update_fields=instance.get_update_fields(
+            exclude=('image',)))
+        if ingredients_data is not None:
+            update_recipe_ingredient(instance, ingredients_data)
+        if tags_data is not None:
+            instance.tags.set(tags_data)
+        if image is not None:
+            replace_recipe_image(instance, image)
         return instance
 
     def to_representation(self, instance):
+        user = self.context['request'].user
+        instance = Recipe.objects.with_related(user).with_user_flags(
+            user).get(pk=instance.pk)
         return RecipeReadSerializer(instance,
                                     context=self.context).data
 
@@ -0,0 +1,158 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.changes import log_recipe_change
+from recipes.images import delete_images
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from .feed import fan_out_recipe
+from .models import ProfileReport
+from .profiler import delete_report_file
+from .cache import (bump_auth_version, bump_cart_version, bump_data_version,
+                    bump_membership_version, bump_recipe_carts)
+from users.models import Follow, User
+from .search import update_search_vectors
+from .utils import change_counter
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients(**kwargs):
+    transaction.on_commit(partial(bump_data_version, 'ingredients'))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(**kwargs):
+    transaction.on_commit(partial(bump_data_version, 'tags'))
+
+
+@receiver(post_save, sender=Ingredient)
+def invalidate_ingredient_carts(instance, **kwargs):
+    transaction.on_commit(partial(
+        bump_recipe_carts, *instance.ingredient_recipe.values_list(
+            'recipe_id', flat=True)))
+
+
+@receiver(post_save, sender=Ingredient)
+def refresh_ingredient_search(instance, **kwargs):
+    transaction.on_commit(partial(
+        update_search_vectors,
+        Recipe.objects.filter(ingredient_recipe__ingredient=instance)))
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def invalidate_shopping_cart(instance, **kwargs):
+    transaction.on_commit(partial(bump_cart_version, instance.user_id))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def invalidate_membership(instance, **kwargs):
+    transaction.on_commit(partial(bump_membership_version,
+                                  instance.user_id))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def invalidate_recipe_carts(instance, **kwargs):
+    transaction.on_commit(partial(bump_recipe_carts, instance.recipe_id))
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_search(instance, **kwargs):
+    transaction.on_commit(partial(
+        update_search_vectors, Recipe.objects.filter(pk=instance.pk)))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def refresh_recipe_ingredients_search(instance, **kwargs):
+    transaction.on_commit(partial(
+        update_search_vectors,
+        Recipe.objects.filter(pk=instance.recipe_id)))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def log_recipe_composition(instance, **kwargs):
+    log_recipe_change(instance.pk)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def log_recipe_ingredients(instance, **kwargs):
+    log_recipe_change(instance.recipe_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_images(instance, **kwargs):
+    if instance.image:
+        delete_images(instance.image.storage, [
+            instance.image.name, *instance.image_variants.values()])
+
+
+@receiver(post_save, sender=Recipe)
+def publish_recipe(instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(fan_out_recipe, instance))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_counts(**kwargs):
+    transaction.on_commit(partial(bump_data_version,
+                                  Recipe._meta.label_lower))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_tokens(instance, **kwargs):
+    transaction.on_commit(partial(bump_auth_version, instance.pk))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token(instance, **kwargs):
+    transaction.on_commit(partial(bump_auth_version, instance.user_id))
+
+
+@receiver(post_delete, sender=ProfileReport)
+def delete_profile_file(instance, **kwargs):
+    transaction.on_commit(partial(delete_report_file, instance.file))
+
+
+COUNTERS = {
+    Recipe: (User, 'author_id', 'recipes_count'),
+    Follow: (User, 'author_id', 'followers_count'),
+    Favorite: (Recipe, 'recipe_id', 'favorites_count'),
+    ShoppingCart: (Recipe, 'recipe_id', 'carts_count'),
+}
+
+
+def update_counter(sender, instance, delta):
+    target_model, target_field, field = COUNTERS[sender]
+    change_counter(
+        target_model.objects.filter(pk=getattr(instance, target_field)),
+        field, delta)
+
+
+def increment_counter(sender, instance, created, **kwargs):
+    if created:
+        update_counter(sender, instance, 1)
+
+
+def decrement_counter(sender, instance, **kwargs):
+    update_counter(sender, instance, -1)
+
+
+for model in COUNTERS:
+    post_save.connect(increment_counter, sender=model)
+    post_delete.connect(decrement_counter, sender=model)
@@ -0,0 +1,75 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+LOCAL_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CACHES=LOCAL_CACHE)
+class APITestCase(TestCase):
+    """Пользователи, теги и ингредиенты, общие для тестов API.
+
+    Версии кэшей сбрасываются после коммита, поэтому запросы, после
+    которых проверяется инвалидация, выполняются в commit().
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader, cls.other = (
+            User.objects.create_user(
+                email=f'{name}@example.com', username=name,
+                password='password-1234', first_name=name,
+                last_name=name)
+            for name in ('author', 'reader', 'other')
+        )
+        cls.tag = Tag.objects.create(name='Завтрак', color='#E26C2D',
+                                     slug='breakfast')
+        cls.flour, cls.milk, cls.eggs = (
+            Ingredient.objects.create(name=name, measurement_unit=unit)
+            for name, unit in (('мука', 'г'), ('молоко', 'мл'),
+                               ('яйца', 'шт'))
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def client_for(self, user=None):
+        client = APIClient()
+        if user is not None:
+            token, _ = Token.objects.get_or_create(user=user)
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    def commit(self, request, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return request(*args, **kwargs)
+
+    def create_recipe(self, name='Блины', author=None, ingredients=None):
+        recipe = Recipe.objects.create(
+            author=author or self.author, name=name, text=name,
+            cooking_time=10, image='recipes/test.jpg')
+        recipe.tags.add(self.tag)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                             amount=amount)
+            for ingredient, amount in (ingredients or {self.flour: 100})
+            .items()
+        )
+        return recipe
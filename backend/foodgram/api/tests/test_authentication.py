@@ -0,0 +1,49 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from api.authentication import StatelessJWTAuthentication
+from api.serializers import StatelessTokenObtainSerializer
+from .base import APITestCase
+
+
+class TokenAuthenticationTests(APITestCase):
+    def login(self):
+        response = self.client_for().post('/api/auth/token/login/', {
+            'email': self.reader.email, 'password': 'password-1234'})
+        self.assertEqual(response.status_code, 200, response.data)
+        client = self.client_for()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}')
+        return client
+
+    def test_logout_revokes_cached_token(self):
+        client = self.login()
+        self.assertEqual(client.get('/api/users/me/').status_code, 200)
+        self.assertEqual(client.get('/api/users/me/').status_code, 200)
+        response = self.commit(client.post, '/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(client.get('/api/users/me/').status_code, 401)
+
+    def test_password_change_revokes_cached_user(self):
+        client = self.login()
+        self.assertEqual(client.get('/api/users/me/').status_code, 200)
+        self.commit(client.post, '/api/users/set_password/', {
+            'current_password': 'password-1234',
+            'new_password': 'password-5678'})
+        user = client.get('/api/users/me/').wsgi_request.user
+        self.assertTrue(user.check_password('password-5678'))
+
+
+class StatelessTokenTests(APITestCase):
+    def test_user_is_built_from_claims(self):
+        token = StatelessTokenObtainSerializer.get_token(
+            self.reader).access_token
+        request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        with CaptureQueriesContext(connection) as queries:
+            user, _ = StatelessJWTAuthentication().authenticate(request)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual((user.pk, user.email),
+                         (self.reader.pk, self.reader.email))
+        self.assertTrue(user.is_authenticated)
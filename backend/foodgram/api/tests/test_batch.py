@@ -0,0 +1,60 @@
+from recipes.models import Favorite, Recipe
+from users.models import Follow, User
+from .base import APITestCase
+
+
+class BatchTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.pancakes = self.create_recipe('Блины')
+        self.pie = self.create_recipe('Пирог')
+        self.client = self.client_for(self.reader)
+
+    def statuses(self, response):
+        self.assertEqual(response.status_code, 200, response.data)
+        return [(item['id'], item['status'])
+                for item in response.data['results']]
+
+    def test_add_reports_status_per_id(self):
+        Favorite.objects.create(user=self.reader, recipe=self.pie)
+        missing = self.pie.id + 1000
+        response = self.commit(
+            self.client.post, '/api/recipes/favorite/batch/',
+            {'ids': [self.pancakes.id, self.pie.id, missing,
+                     self.pancakes.id]}, format='json')
+        self.assertEqual(self.statuses(response), [
+            (self.pancakes.id, 'created'), (self.pie.id, 'exists'),
+            (missing, 'not_found')])
+        self.assertEqual(Recipe.objects.get(
+            pk=self.pancakes.pk).favorites_count, 1)
+
+    def test_remove_reports_status_per_id(self):
+        Favorite.objects.create(user=self.reader, recipe=self.pie)
+        response = self.commit(
+            self.client.delete, '/api/recipes/favorite/batch/',
+            {'ids': [self.pie.id, self.pancakes.id]}, format='json')
+        self.assertEqual(self.statuses(response), [
+            (self.pie.id, 'deleted'), (self.pancakes.id, 'not_found')])
+        self.assertFalse(Favorite.objects.filter(user=self.reader).exists())
+
+    def test_flags_follow_batch_changes(self):
+        path = f'/api/recipes/{self.pancakes.id}/'
+        self.assertFalse(self.client.get(path).data['is_in_shopping_cart'])
+        self.commit(self.client.post, '/api/recipes/shopping_cart/batch/',
+                    {'ids': [self.pancakes.id]}, format='json')
+        self.assertTrue(self.client.get(path).data['is_in_shopping_cart'])
+        self.commit(self.client.delete, '/api/recipes/shopping_cart/clear/')
+        self.assertFalse(self.client.get(path).data['is_in_shopping_cart'])
+
+    def test_subscribe_batch(self):
+        response = self.commit(
+            self.client.post, '/api/users/subscribe/batch/',
+            {'ids': [self.author.id, self.reader.id]}, format='json')
+        self.assertEqual(self.statuses(response), [
+            (self.author.id, 'created'), (self.reader.id, 'invalid')])
+        self.assertTrue(Follow.objects.filter(
+            user=self.reader, author=self.author).exists())
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).followers_count, 1)
+        feed = self.client.get('/api/recipes/feed/')
+        self.assertEqual(feed.data['count'], 2)
@@ -0,0 +1,89 @@
+import base64
+from io import BytesIO
+
+from PIL import Image
+
+from recipes.models import Recipe, RecipeIngredient
+from .base import APITestCase
+
+
+def create_image():
+    buffer = BytesIO()
+    Image.new('RGB', (40, 30), (200, 120, 80)).save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+class RecipeWriteTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.author)
+
+    def composition(self, recipe):
+        return dict(RecipeIngredient.objects.filter(
+            recipe=recipe).values_list('ingredient_id', 'amount'))
+
+    def test_create_merges_repeated_ingredients(self):
+        response = self.client.post('/api/recipes/', {
+            'name': 'Омлет', 'text': 'Взбить.', 'cooking_time': 5,
+            'image': create_image(), 'tags': [self.tag.id],
+            'ingredients': [
+                {'id': self.eggs.id, 'amount': 2},
+                {'id': self.milk.id, 'amount': 50},
+                {'id': self.eggs.id, 'amount': 1},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        recipe = Recipe.objects.get(pk=response.data['id'])
+        self.assertEqual(self.composition(recipe),
+                         {self.eggs.id: 3, self.milk.id: 50})
+
+    def test_create_rejects_unknown_ingredient(self):
+        response = self.client.post('/api/recipes/', {
+            'name': 'Омлет', 'text': 'Взбить.', 'cooking_time': 5,
+            'image': create_image(), 'tags': [self.tag.id],
+            'ingredients': [{'id': 10 ** 6, 'amount': 2}],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Recipe.objects.filter(name='Омлет').exists())
+
+    def test_patch_updates_only_changed_ingredients(self):
+        recipe = self.create_recipe(
+            ingredients={self.flour: 100, self.milk: 200})
+        kept = RecipeIngredient.objects.get(recipe=recipe,
+                                            ingredient=self.flour)
+        changed = RecipeIngredient.objects.get(recipe=recipe,
+                                               ingredient=self.milk)
+        response = self.client.patch(f'/api/recipes/{recipe.id}/', {
+            'ingredients': [
+                {'id': self.flour.id, 'amount': 100},
+                {'id': self.milk.id, 'amount': 250},
+                {'id': self.eggs.id, 'amount': 2},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            self.composition(recipe),
+            {self.flour.id: 100, self.milk.id: 250, self.eggs.id: 2})
+        self.assertTrue(RecipeIngredient.objects.filter(
+            pk=kept.pk, amount=100).exists())
+        self.assertTrue(RecipeIngredient.objects.filter(
+            pk=changed.pk, amount=250).exists())
+
+    def test_patch_removes_missing_ingredients(self):
+        recipe = self.create_recipe(
+            ingredients={self.flour: 100, self.milk: 200})
+        response = self.client.patch(f'/api/recipes/{recipe.id}/', {
+            'ingredients': [{'id': self.milk.id, 'amount': 200}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.composition(recipe), {self.milk.id: 200})
+
+    def test_patch_without_ingredients_keeps_them(self):
+        recipe = self.create_recipe(ingredients={self.flour: 100})
+        response = self.client.patch(f'/api/recipes/{recipe.id}/',
+                                     {'name': 'Оладьи'}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Оладьи')
+        self.assertEqual(self.composition(recipe), {self.flour.id: 100})
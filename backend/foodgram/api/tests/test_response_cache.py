@@ -0,0 +1,29 @@
+from recipes.models import Ingredient, Tag
+from .base import APITestCase
+
+
+class ResponseCacheTests(APITestCase):
+    def test_etag_and_not_modified(self):
+        client = self.client_for()
+        response = client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_write_invalidates_cached_tags(self):
+        client = self.client_for()
+        etag = client.get('/api/tags/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Ужин', color='#49B64E', slug='dinner')
+        response = client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('dinner', response.content.decode())
+
+    def test_write_invalidates_cached_ingredients(self):
+        client = self.client_for()
+        client.get('/api/ingredients/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.create(name='соль', measurement_unit='г')
+        response = client.get('/api/ingredients/')
+        self.assertIn('соль', response.content.decode())
@@ -0,0 +1,46 @@
+import json
+
+from recipes.models import ShoppingCart
+from .base import APITestCase
+
+
+class ShoppingListTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.pancakes = self.create_recipe(
+            'Блины', ingredients={self.flour: 200, self.milk: 500})
+        self.pie = self.create_recipe(
+            'Пирог', ingredients={self.flour: 300, self.eggs: 2})
+        for recipe in (self.pancakes, self.pie):
+            ShoppingCart.objects.create(user=self.reader, recipe=recipe)
+        self.client = self.client_for(self.reader)
+
+    def download(self):
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/?format=json')
+        self.assertEqual(response.status_code, 200)
+        content = (b''.join(response.streaming_content)
+                   if response.streaming else response.content)
+        return {(item['name'], item['measurement_unit']): item['amount']
+                for item in json.loads(content)}
+
+    def test_amounts_are_summed(self):
+        self.assertEqual(self.download(), {
+            ('мука', 'г'): 500, ('молоко', 'мл'): 500, ('яйца', 'шт'): 2})
+
+    def test_cached_list_follows_cart(self):
+        self.download()
+        self.commit(self.client.delete,
+                    f'/api/recipes/{self.pie.id}/shopping_cart/')
+        self.assertEqual(self.download(), {
+            ('мука', 'г'): 200, ('молоко', 'мл'): 500})
+
+    def test_cached_list_follows_recipe_ingredients(self):
+        self.download()
+        self.commit(
+            self.client_for(self.author).patch,
+            f'/api/recipes/{self.pie.id}/',
+            {'ingredients': [{'id': self.flour.id, 'amount': 100}]},
+            format='json')
+        self.assertEqual(self.download(), {
+            ('мука', 'г'): 300, ('молоко', 'мл'): 500})
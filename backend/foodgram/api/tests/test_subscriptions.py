@@ -0,0 +1,24 @@
+from users.models import Follow
+from .base import APITestCase
+
+
+class SubscriptionsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        for number in range(3):
+            self.create_recipe(f'Рецепт {number}')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_recipes_limit(self):
+        response = self.client_for(self.reader).get(
+            '/api/users/subscriptions/?recipes_limit=2')
+        self.assertEqual(response.status_code, 200)
+        author, = response.data['results']
+        self.assertEqual(author['recipes_count'], 3)
+        self.assertEqual(len(author['recipes']), 2)
+        self.assertTrue(author['is_subscribed'])
+
+    def test_invalid_recipes_limit(self):
+        response = self.client_for(self.reader).get(
+            '/api/users/subscriptions/?recipes_limit=0')
+        self.assertEqual(response.status_code, 400)
@@ -1,7 +1,10 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
+from rest_framework_simplejwt.views import TokenRefreshView
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet, UserViewSet
+from foodgram.settings import AUTH_STATELESS_TOKENS
+from .views import (IngredientViewSet, MetricsView, RecipeViewSet,
+                    StatelessTokenObtainView, TagViewSet, UserViewSet)
 
 router = DefaultRouter()
 router.register(r'tags', TagViewSet, basename='tags')
@@ -11,6 +14,13 @@ router.register(r'users', UserViewSet, basename='users')
 
 
 urlpatterns = [
+    path('metrics/', MetricsView.as_view()),
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken'))
 ]
+
+if AUTH_STATELESS_TOKENS:
+    urlpatterns += [
+        path('auth/jwt/create/', StatelessTokenObtainView.as_view()),
+        path('auth/jwt/refresh/', TokenRefreshView.as_view()),
+    ]
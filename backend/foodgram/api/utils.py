@@ -1,32 +1,80 @@
-from django.db.models import F
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Greatest
 
 from users.models import Follow
-from recipes.models import RecipeIngredient, Ingredient
+from recipes.minhash import schedule_minhash_update
+from recipes.models import RecipeIngredient
+from .cache import bump_recipe_carts
 
 
 def get_subscribed(obj, request):
     # request = self.context.get('request').user.id
     if request is None or request.user.is_anonymous:
         return False
+    if hasattr(obj, 'is_subscribed'):
+        return obj.is_subscribed
     return Follow.objects.filter(user=request.user, author=obj).exists()
 
 
-def create_recipe_ingredient(recipe, ingredients_data):
-    ingredients = []
+def change_counter(queryset, field, delta):
+    queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def order_by_scores(queryset, scores, name):
+    if not scores:
+        return queryset.none()
+    return queryset.filter(pk__in=scores).annotate(**{name: Case(
+        *[When(pk=pk, then=Value(score)) for pk, score in scores.items()],
+        output_field=FloatField(),
+    )}).order_by(f'-{name}', '-pub_date')
+
+
+def merge_ingredient_amounts(ingredients_data):
+    """Повторы одного ингредиента складываются в одну строку."""
+    amounts = defaultdict(int)
     for ingredient_data in ingredients_data:
-        ingredient_id = ingredient_data['ingredient']['id']
-        amount = ingredient_data['amount']
-        ingredient = Ingredient.objects.get(id=ingredient_id)
-        existing_recipe_ingredient = RecipeIngredient.objects.filter(
-            recipe=recipe,
-            ingredient=ingredient_id)
-        if existing_recipe_ingredient.exists():
-            existing_recipe_ingredient.update(amount=F('amount') + amount)
-        else:
-            recipe_ingredient = RecipeIngredient(
-                recipe=recipe,
-                ingredient=ingredient,
-                amount=amount
-            )
-            ingredients.append(recipe_ingredient)
-    RecipeIngredient.objects.bulk_create(ingredients)
+        amounts[ingredient_data['ingredient']['id']] += ingredient_data[
+            'amount']
+    return amounts
+
+
+def create_recipe_ingredient(recipe, ingredients_data):
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient_id=ingredient_id,
+                         amount=amount)
+        for ingredient_id, amount in merge_ingredient_amounts(
+            ingredients_data).items()
+    )
+    transaction.on_commit(partial(bump_recipe_carts, recipe.id))
+    schedule_minhash_update(recipe.id)
+
+
+def update_recipe_ingredient(recipe, ingredients_data):
+    amounts = merge_ingredient_amounts(ingredients_data)
+    to_delete, to_update = [], []
+    for recipe_ingredient in recipe.ingredient_recipe.all():
+        amount = amounts.pop(recipe_ingredient.ingredient_id, None)
+        if amount is None:
+            to_delete.append(recipe_ingredient.id)
+        elif amount != recipe_ingredient.amount:
+            recipe_ingredient.amount = amount
+            to_update.append(recipe_ingredient)
+    if not (to_delete or to_update or amounts):
+        return
+    if to_delete:
+        RecipeIngredient.objects.filter(id__in=to_delete).delete()
+    if to_update:
+        RecipeIngredient.objects.bulk_update(to_update, ['amount'])
+    if amounts:
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient_id=ingredient_id,
+                             amount=amount)
+            for ingredient_id, amount in amounts.items()
+        )
+    transaction.on_commit(partial(bump_recipe_carts, recipe.id))
+    if to_delete or amounts:
+        schedule_minhash_update(recipe.id)
@@ -1,30 +1,56 @@
-from django.http import HttpResponse
+import os
+
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Sum
+from django.db.models import (OuterRef, Prefetch, Sum,
+                              prefetch_related_objects)
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import status, viewsets
+from rest_framework import serializers, status, viewsets
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import (AllowAny, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.viewsets import ReadOnlyModelViewSet
-
-from foodgram.settings import FILENAME
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from foodgram.settings import (FILENAME, INGREDIENT_SEARCH_LIMIT,
+                               RECOMMENDATIONS_TOP_K,
+                               RELATED_RECIPES_LIMIT,
+                               RELATED_RECIPES_THRESHOLD,
+                               SHOPPING_LIST_CACHE_TIMEOUT,
+                               SHOPPING_LIST_CHUNK_SIZE)
+from recipes.minhash import find_similar
 from recipes.models import (Favorite,
                             Ingredient,
                             Recipe,
                             RecipeIngredient,
+                            RecipeNeighbor,
                             ShoppingCart,
-                            Tag)
+                            Tag,
+                            user_flag)
 from users.models import Follow, User
+from .batch import add_many, remove_many
+from .cache import cache_stream, get_shopping_list_key
+from .feed import backfill_feed, get_feed, trim_feed
+from .membership import membership_cache
+from .mixins import CachedResponseMixin
 from .permissions import IsAuthorOrAdminOrReadOnly
-from .serializers import (FollowSerializer, IngredientSerializer,
+from .metrics import render_metrics
+from .renderers import SHOPPING_LIST_RENDERERS, PrometheusRenderer
+from .serializers import (BatchSerializer, FollowSerializer,
+                          IngredientSerializer,
                           RecipePostUpdateSerializer, RecipeReadSerializer,
-                          ShortRecipeSerializer, TagSerializer,
+                          TagSerializer,
                           UserGetSerializer, UserPostSerializer,
                           ChangePasswordSerializer,
+                          StatelessTokenObtainSerializer,
                           FavoriteSerializer, ShoppingCartSerializer)
 from .filters import IngredientFilter, RecipeFilter
-from .pagination import LimitPageNumberPaginator
+from .pagination import RecipePaginator
+from .search import ingredient_index
+from .utils import order_by_scores
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -53,17 +79,41 @@ class UserViewSet(viewsets.ModelViewSet):
             permission_classes=(IsAuthenticated,))
     def set_password(self, request):
         serializer = ChangePasswordSerializer(
-            request.user, data=request.data)
+            User.objects.get(pk=request.user.pk), data=request.data)
         if serializer.is_valid(raise_exception=True):
             serializer.save()
         return Response({'detail': 'Пароль успешно изменен!'},
                         status=status.HTTP_204_NO_CONTENT)
 
+    def get_recipes_limit(self, request):
+        recipes_limit = request.query_params.get('recipes_limit')
+        if recipes_limit is None:
+            return None
+        try:
+            recipes_limit = int(recipes_limit)
+        except ValueError:
+            recipes_limit = 0
+        if recipes_limit < 1:
+            raise serializers.ValidationError(
+                {'recipes_limit': 'Должно быть целым числом больше 0.'})
+        return recipes_limit
+
     @action(detail=False, methods=['GET'],
             permission_classes=[IsAuthenticated, ])
     def subscriptions(self, request):
-        queryset = User.objects.filter(following__user=request.user)
+        recipes_limit = self.get_recipes_limit(request)
+        queryset = User.objects.filter(
+            following__user=request.user
+        ).annotate(
+            is_subscribed=user_flag(
+                Follow, request.user, author=OuterRef('pk')),
+        ).order_by('id')
         page = self.paginate_queryset(queryset)
+        prefetch_related_objects(page, Prefetch(
+            'recipes',
+            queryset=Recipe.objects.filter(
+                author__in=page).latest_per_author(recipes_limit)
+        ))
         serializer = FollowSerializer(page, many=True,
                                       context={'request': request})
         return self.get_paginated_response(serializer.data)
@@ -88,6 +138,7 @@ class UserViewSet(viewsets.ModelViewSet):
                 return Response(
                     {"detail": 'Вы уже подписаны на данного пользователя'},
                     status=status.HTTP_400_BAD_REQUEST)
+            backfill_feed(request.user, author)
 
             return Response({"detail": 'Подписка успешно создана'},
                             status=status.HTTP_201_CREATED)
@@ -96,6 +147,7 @@ class UserViewSet(viewsets.ModelViewSet):
             follow = Follow.objects.get(user=request.user,
                                         author=author)
             follow.delete()
+            trim_feed(request.user, author)
             return Response(
                 {"detail": 'Вы отписались от данного пользователя'},
                 status=status.HTTP_204_NO_CONTENT)
@@ -105,19 +157,47 @@ class UserViewSet(viewsets.ModelViewSet):
                 {"detail": 'Вы не были подписаны на данного пользователя'},
                 status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=False, methods=['POST', 'DELETE'],
+            url_path='subscribe/batch',
+            permission_classes=[IsAuthenticated, ])
+    def subscribe_batch(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        if request.method == 'POST':
+            results = add_many(Follow, request.user, 'author', ids,
+                               exclude={request.user.id})
+        else:
+            results = remove_many(Follow, request.user, 'author', ids)
+        return Response({'results': results})
+
+
+class MetricsView(APIView):
+    permission_classes = (IsAdminUser,)
+    renderer_classes = (PrometheusRenderer,)
+
+    def get(self, request):
+        return Response(render_metrics())
+
+
+class StatelessTokenObtainView(TokenObtainPairView):
+    serializer_class = StatelessTokenObtainSerializer
+
 
 class FollowViewSet(viewsets.ModelViewSet):
     queryset = Follow.objects.all()
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(CachedResponseMixin, ReadOnlyModelViewSet):
+    cache_scope = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(CachedResponseMixin, ReadOnlyModelViewSet):
+    cache_scope = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
@@ -125,17 +205,39 @@ class IngredientViewSet(ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        if not ingredient_index.is_warm:
+            ingredient_index.warm_up()
+            return super().list(request, *args, **kwargs)
+        serializer = self.get_serializer(
+            ingredient_index.search(name, INGREDIENT_SEARCH_LIMIT),
+            many=True)
+        return Response(serializer.data)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrAdminOrReadOnly,)
-    pagination_class = LimitPageNumberPaginator
+    pagination_class = RecipePaginator
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     http_method_names = ['get', 'post', 'patch', 'create', 'delete']
 
+    def get_queryset(self):
+        return Recipe.objects.with_related(self.request.user)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ['list', 'retrieve', 'feed', 'similar',
+                           'recommended', 'related']:
+            context['membership'] = membership_cache.get(self.request.user)
+        return context
+
     def get_serializer_class(self):
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'feed', 'similar',
+                           'recommended', 'related']:
             return RecipeReadSerializer
         elif self.action == 'favorite':
             return FavoriteSerializer
@@ -149,29 +251,36 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         serializer.save(author=self.request.user)
 
-    def shortrecipe_get_serializer(self, recipe, request):
-        serializer = ShortRecipeSerializer(recipe, data=request.data,
-                                           context={"request": request})
-        serializer.is_valid(raise_exception=True)
-        return serializer
+    def get_threshold(self):
+        threshold = self.request.query_params.get(
+            'threshold', RELATED_RECIPES_THRESHOLD)
+        try:
+            threshold = float(threshold)
+        except ValueError:
+            threshold = -1
+        if not 0 <= threshold <= 1:
+            raise serializers.ValidationError(
+                {'threshold': 'Должно быть числом от 0 до 1.'})
+        return threshold
 
     def recipe_get(self, recipe, **kwargs):
         recipe = get_object_or_404(Recipe, pk=kwargs['pk'])
         return recipe
 
     def create_or_delete_object(self, request, recipe, model_class):
-        serializer = self.shortrecipe_get_serializer(recipe, request)
-
         if not model_class.objects.filter(user=request.user,
                                           recipe=recipe).exists():
             model_class.objects.create(user=request.user, recipe=recipe)
-            serializer.save(user=request.user, recipe=recipe)
+            membership_cache.update(request.user.id, model_class,
+                                    {recipe.id}, added=True)
             status_code = status.HTTP_201_CREATED
             success_response = {"detail": "Рецепт успешно добавлен."}
         else:
             object_to_delete = get_object_or_404(
                 model_class, user=request.user, recipe=recipe)
             object_to_delete.delete()
+            membership_cache.update(request.user.id, model_class,
+                                    {recipe.id}, added=False)
             status_code = status.HTTP_204_NO_CONTENT
             success_response = {"detail": "Рецепт успешно удален."}
 
@@ -189,26 +298,115 @@ class RecipeViewSet(viewsets.ModelViewSet):
         recipe = self.recipe_get(Recipe, **kwargs)
         return self.create_or_delete_object(request, recipe, ShoppingCart)
 
+    def batch_response(self, request, model_class):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        if request.method == 'POST':
+            results = add_many(model_class, request.user, 'recipe', ids)
+        else:
+            results = remove_many(model_class, request.user, 'recipe', ids)
+        return Response({'results': results})
+
+    @action(detail=False, methods=['POST', 'DELETE'],
+            url_path='favorite/batch',
+            permission_classes=[IsAuthenticated, ])
+    def favorite_batch(self, request):
+        return self.batch_response(request, Favorite)
+
+    @action(detail=False, methods=['POST', 'DELETE'],
+            url_path='shopping_cart/batch',
+            permission_classes=[IsAuthenticated, ])
+    def shopping_cart_batch(self, request):
+        return self.batch_response(request, ShoppingCart)
+
+    @action(detail=False, methods=['DELETE'],
+            url_path='shopping_cart/clear',
+            permission_classes=[IsAuthenticated, ])
+    def shopping_cart_clear(self, request):
+        return Response({'results': remove_many(
+            ShoppingCart, request.user, 'recipe')})
+
     @action(detail=False, methods=['GET'],
             permission_classes=(IsAuthenticated,))
-    def download_shopping_cart(self, request):
-        shopping_cart_recipes = ShoppingCart.objects.filter(user=request.user)
-        recipe_ids = shopping_cart_recipes.values_list('recipe_id', flat=True)
-
-        ingredient_quantities = RecipeIngredient.objects.filter(
-            recipe__id__in=recipe_ids
-        ).values('ingredient__name', 'ingredient__measurement_unit').annotate(
-            total_amount=Sum('amount')
-        )
+    def feed(self, request):
+        queryset = self.filter_queryset(
+            get_feed(request.user).with_related(request.user))
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
-        file_content = "\n".join(
-            [f"{item['ingredient__name']} "
-             f"({item['ingredient__measurement_unit']}) "
-             f"— {item['total_amount']}" for item in ingredient_quantities]
-        )
+    @action(detail=True, methods=['GET'])
+    def similar(self, request, **kwargs):
+        recipe = self.recipe_get(Recipe, **kwargs)
+        queryset = self.get_queryset().filter(
+            neighbor_of__recipe=recipe
+        ).order_by('-neighbor_of__score')
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['GET'])
+    def related(self, request, **kwargs):
+        recipe = self.recipe_get(Recipe, **kwargs)
+        scores = find_similar(recipe.minhash, self.get_threshold(),
+                              Recipe.objects.exclude(pk=recipe.pk))
+        scores = dict(sorted(scores.items(), key=lambda item: -item[1])[
+            :RELATED_RECIPES_LIMIT])
+        queryset = order_by_scores(self.get_queryset(), scores, 'similarity')
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
 
-        response = HttpResponse(content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename={FILENAME}'
-        response.write(file_content)
+    @action(detail=False, methods=['GET'],
+            permission_classes=(IsAuthenticated,))
+    def recommended(self, request):
+        favorites = Favorite.objects.filter(
+            user=request.user).values('recipe')
+        scores = dict(RecipeNeighbor.objects.filter(
+            recipe__in=favorites
+        ).exclude(
+            neighbor__in=favorites
+        ).values('neighbor').annotate(
+            total=Sum('score')
+        ).order_by('-total').values_list(
+            'neighbor', 'total'
+        )[:RECOMMENDATIONS_TOP_K])
+        queryset = order_by_scores(self.get_queryset(), scores, 'score')
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
 
+    @action(detail=False, methods=['GET'],
+            permission_classes=(IsAuthenticated,),
+            renderer_classes=SHOPPING_LIST_RENDERERS)
+    def download_shopping_cart(self, request):
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        key = get_shopping_list_key(request.user.id, renderer.format)
+        content = cache.get(key)
+
+        if content is None:
+            ingredient_quantities = RecipeIngredient.objects.filter(
+                recipe__shopping_cart__user=request.user
+            ).values(
+                'ingredient__name', 'ingredient__measurement_unit'
+            ).annotate(
+                total_amount=Sum('amount')
+            ).order_by(
+                'ingredient__name', 'ingredient__measurement_unit'
+            ).iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+            chunks = renderer.stream(ingredient_quantities)
+            if renderer.streaming:
+                response = StreamingHttpResponse(
+                    cache_stream(key, chunks, SHOPPING_LIST_CACHE_TIMEOUT),
+                    content_type=content_type
+                )
+            else:
+                content = b''.join(chunks)
+                cache.set(key, content, SHOPPING_LIST_CACHE_TIMEOUT)
+        if content is not None:
+            response = HttpResponse(content, content_type=content_type)
+
+        filename = f'{os.path.splitext(FILENAME)[0]}.{renderer.format}'
+        response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
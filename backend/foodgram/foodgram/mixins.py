@@ -0,0 +1,22 @@
+class DenormalizedFieldsMixin:
+    """save() существующего объекта не перезаписывает производные поля.
+
+    Счётчики и другие колонки из denormalized_fields обновляются
+    отдельными запросами; остальные поля, которые нельзя затирать,
+    вызывающий код исключает явно через get_update_fields(exclude).
+    """
+
+    denormalized_fields = ()
+
+    def get_update_fields(self, exclude=()):
+        return [
+            field.name for field in self._meta.concrete_fields
+            if not field.primary_key
+            and field.name not in self.denormalized_fields
+            and field.name not in exclude
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('update_fields'):
+            kwargs['update_fields'] = self.get_update_fields()
+        super().save(*args, **kwargs)
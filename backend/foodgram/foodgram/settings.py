@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 
 from dotenv import load_dotenv
 from pathlib import Path
@@ -20,6 +21,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework.authtoken',
@@ -32,6 +34,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -39,6 +42,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ProfilerMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -73,6 +77,28 @@ DATABASES = {
     }
 }
 
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'
+)
+# В кэше лежат версии, счётчики, ответы и списки покупок всех
+# пользователей. FileBasedCache по умолчанию держит 300 записей и при
+# переполнении стирает случайную треть, в том числе версии, — это массовый
+# сброс кэша. Лимит поднят под этот объём, а стирается десятая часть;
+# цена — каждая запись пересчитывает файлы каталога, поэтому под большой
+# нагрузкой лучше memcached через CACHE_BACKEND и CACHE_LOCATION.
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 100000)),
+            'CULL_FREQUENCY': int(os.getenv('CACHE_CULL_FREQUENCY', 10)),
+        } if CACHE_BACKEND.endswith('FileBasedCache') else {},
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -88,18 +114,34 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+AUTH_STATELESS_TOKENS = os.getenv('AUTH_STATELESS_TOKENS', 'False') == 'True'
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TTL = 300
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        *(['api.authentication.StatelessJWTAuthentication']
+          if AUTH_STATELESS_TOKENS else []),
+        'api.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.MeasuredJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
 }
 
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    'AUTH_HEADER_TYPES': ('Bearer',),
+}
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
 }
@@ -116,14 +158,67 @@ USE_TZ = True
 
 AUTH_USER_MODEL = "users.User"
 
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
 STATIC_URL = '/static/'
 STATIC_ROOT = Path(BASE_DIR) / 'collected_static'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+DEFAULT_FILE_STORAGE = 'recipes.storage.ContentHashStorage'
 
 USERS_MAX_LENGTH = 150
 RECIPES_MAX_LENGTH = 200
 FORBIDDEN_USERNAMES = ['me', 'set_password', 'subscriptions', 'subscribe',
                        'shopping_cart', 'favorite']
 FILENAME = 'shopping_cart.txt'
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60
+RESPONSE_CACHE_TIMEOUT = 24 * 60 * 60
+COUNT_CACHE_TIMEOUT = 30
+FEED_FANOUT_LIMIT = 10000
+FEED_FANOUT_BATCH_SIZE = 1000
+FEED_BACKFILL_SIZE = 100
+MEMBERSHIP_CACHE_SIZE = 1000
+MEMBERSHIP_CACHE_TTL = 5 * 60
+SHOPPING_LIST_CHUNK_SIZE = 500
+IMAGE_FORMAT = 'WEBP'
+IMAGE_QUALITY = 85
+IMAGE_MAX_SIZE = (1280, 1280)
+IMAGE_THUMBNAIL_SIZES = {
+    'small': (300, 300),
+    'medium': (600, 600),
+}
+IMAGE_JOB_MAX_ATTEMPTS = 3
+IMAGE_JOB_POLL_INTERVAL = 5
+PDF_FONT = os.getenv('PDF_FONT',
+                     '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+INGREDIENT_NGRAM_SIZE = 3
+INGREDIENT_SEARCH_LIMIT = 50
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', 'russian')
+RECIPE_CHANGE_LOG_SIZE = 1000
+PANTRY_MAX_RESULTS = 200
+PANTRY_LOAD_CHUNK_SIZE = 10000
+RECOMMENDATIONS_TOP_K = 20
+RECOMMENDATIONS_CHUNK_SIZE = 1000
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16
+MINHASH_SEED = 20261018
+RELATED_RECIPES_THRESHOLD = 0.5
+RELATED_RECIPES_LIMIT = 20
+RECIPE_DUPLICATE_THRESHOLD = 0.9
+BATCH_MAX_SIZE = 100
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5,
+                           5, 10)
+METRICS_QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+METRICS_SLOW_REQUEST = float(os.getenv('METRICS_SLOW_REQUEST', 1))
+METRICS_SLOW_QUERIES = int(os.getenv('METRICS_SLOW_QUERIES', 50))
+METRICS_SLOW_SQL_COUNT = 3
+PROFILER_DIR = os.getenv('PROFILER_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILER_MAX_REPORTS = 200
+PROFILER_INTERVAL = 0.005
+PROFILER_SAMPLE_RATES = {
+    'RecipeViewSet.list': 1000,
+    'RecipeViewSet.download_shopping_cart': 100,
+}
@@ -1,7 +1,9 @@
 from django.contrib import admin
 
-from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
+from .images import replace_recipe_image
+from .minhash import schedule_minhash_update
+from .models import (Favorite, Ingredient, Recipe, RecipeImageJob,
+                     RecipeIngredient, ShoppingCart, Tag)
 
 
 class IngredientAdmin(admin.TabularInline):
@@ -13,6 +15,19 @@ class RecipeAdmin(admin.ModelAdmin):
         IngredientAdmin,
     ]
     filter_horizontal = ('ingredients',)
+    list_display = ('name', 'author', 'favorites_count', 'carts_count')
+    readonly_fields = ('favorites_count', 'carts_count')
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        obj.save(update_fields=obj.get_update_fields(exclude=('image',)))
+        if 'image' in form.changed_data:
+            replace_recipe_image(obj, form.cleaned_data['image'])
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        schedule_minhash_update(form.instance.pk)
 
 
 admin.site.register(Tag)
@@ -20,3 +35,4 @@ admin.site.register(Ingredient)
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(ShoppingCart)
 admin.site.register(Favorite)
+admin.site.register(RecipeImageJob)
@@ -0,0 +1,77 @@
+import threading
+
+from django.db import connection, transaction
+from django.db.models import Max
+
+from foodgram.settings import RECIPE_CHANGE_LOG_SIZE
+from .models import RecipeChange
+
+_pending = threading.local()
+
+
+def get_last_change():
+    return RecipeChange.objects.aggregate(last=Max('pk'))['last'] or 0
+
+
+def write_recipe_changes(recipe_ids):
+    """Записывает изменения и обрезает журнал до RECIPE_CHANGE_LOG_SIZE.
+
+    В PostgreSQL таблица блокируется на время этой короткой транзакции:
+    запись с меньшим номером не может стать видна позже записи с большим,
+    и читатель не пропустит её, продвинувшись дальше.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'LOCK TABLE {RecipeChange._meta.db_table} '
+                    f'IN EXCLUSIVE MODE')
+        RecipeChange.objects.bulk_create(
+            RecipeChange(recipe_id=recipe_id) for recipe_id in recipe_ids)
+        RecipeChange.objects.filter(
+            pk__lte=get_last_change() - RECIPE_CHANGE_LOG_SIZE).delete()
+
+
+def flush_recipe_changes():
+    recipe_ids = getattr(_pending, 'recipe_ids', None)
+    _pending.recipe_ids = set()
+    if recipe_ids:
+        write_recipe_changes(recipe_ids)
+
+
+def log_recipe_change(recipe_id):
+    """Запись в журнал после коммита, одна на рецепт за транзакцию."""
+    recipe_ids = getattr(_pending, 'recipe_ids', None)
+    if recipe_ids is None:
+        recipe_ids = _pending.recipe_ids = set()
+    recipe_ids.add(recipe_id)
+    transaction.on_commit(flush_recipe_changes)
+
+
+def invalidate_recipe_changes():
+    """Массовая загрузка без сигналов: индексы перестроятся целиком."""
+    write_recipe_changes([None])
+
+
+def get_recipe_changes(since):
+    """Номер последней записи и рецепты, изменённые после since.
+
+    Вместо множества возвращается None, если индекс надо собрать целиком:
+    при первой сборке, после массовой загрузки и когда журнал обрезан
+    дальше since или изменений больше RECIPE_CHANGE_LOG_SIZE.
+    """
+    if since is None:
+        return get_last_change(), None
+    changes = list(RecipeChange.objects.filter(pk__gte=since).order_by(
+        'pk').values_list('pk', 'recipe_id')[:RECIPE_CHANGE_LOG_SIZE + 2])
+    if not since and not changes:
+        return 0, set()
+    # Запись since должна уцелеть, иначе часть журнала после неё обрезана;
+    # журнал, пустой при первой сборке, начинается с номера 1.
+    if (not changes or changes[0][0] != (since or 1)
+            or len(changes) > RECIPE_CHANGE_LOG_SIZE + 1):
+        return get_last_change(), None
+    recipe_ids = {recipe_id for pk, recipe_id in changes if pk != since}
+    if None in recipe_ids:
+        return changes[-1][0], None
+    return changes[-1][0], recipe_ids
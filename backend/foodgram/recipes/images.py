@@ -0,0 +1,80 @@
+import os
+from functools import partial
+from io import BytesIO
+from uuid import uuid4
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from foodgram.settings import (IMAGE_FORMAT, IMAGE_MAX_SIZE, IMAGE_QUALITY,
+                               IMAGE_THUMBNAIL_SIZES)
+from .models import Recipe, RecipeImageJob
+
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp', 'PNG': 'png'}
+
+
+def encode_image(image, size):
+    image = image.copy()
+    image.thumbnail(size)
+    if IMAGE_FORMAT == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, IMAGE_FORMAT, quality=IMAGE_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def delete_images(storage, names):
+    for name in names:
+        storage.delete(name)
+
+
+def process_recipe_image(recipe):
+    storage = recipe.image.storage
+    source = recipe.image.name
+    with storage.open(source, 'rb') as file:
+        with Image.open(file) as image:
+            image = ImageOps.exif_transpose(image)
+    stem = os.path.join(os.path.dirname(source), str(uuid4()))
+    extension = EXTENSIONS[IMAGE_FORMAT]
+    name = storage.save(f'{stem}.{extension}',
+                        encode_image(image, IMAGE_MAX_SIZE))
+    variants = {
+        size: storage.save(f'{stem}_{size}.{extension}',
+                           encode_image(image, dimensions))
+        for size, dimensions in IMAGE_THUMBNAIL_SIZES.items()
+    }
+    updated = Recipe.objects.filter(
+        pk=recipe.pk, image=source
+    ).update(image=name, image_variants=variants)
+    if updated:
+        delete_images(storage, [source, *recipe.image_variants.values()])
+    else:
+        delete_images(storage, [name, *variants.values()])
+    return updated
+
+
+def replace_recipe_image(recipe, image):
+    """Новая загрузка: картинка пишется отдельно от остальных полей.
+
+    API и админка сохраняют рецепт без image, а image_variants в save()
+    не пишется вовсе, поэтому запрос не вернёт имя, которое фоновая
+    обработка уже заменила.
+    """
+    storage = recipe.image.storage
+    with transaction.atomic():
+        current = Recipe.objects.select_for_update().values(
+            'image', 'image_variants').get(pk=recipe.pk)
+        recipe.image.save(image.name, image, save=False)
+        recipe.image_variants = {}
+        updated = Recipe.objects.filter(
+            pk=recipe.pk, image=current['image']
+        ).update(image=recipe.image.name, image_variants={})
+        if not updated:
+            delete_images(storage, [recipe.image.name])
+            return updated
+        transaction.on_commit(partial(
+            delete_images, storage,
+            [current['image'], *current['image_variants'].values()]))
+        RecipeImageJob.objects.create(recipe=recipe, image=recipe.image.name)
+    return updated
@@ -0,0 +1,264 @@
+import base64
+import json
+import random
+from collections import defaultdict
+from io import BytesIO
+from time import perf_counter
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from foodgram.settings import ALLOWED_HOSTS
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from users.models import User
+
+MIX = {
+    'recipe_list': 30,
+    'recipe_detail': 20,
+    'ingredient_autocomplete': 15,
+    'favorite_toggle': 10,
+    'shopping_cart_toggle': 8,
+    'subscriptions': 8,
+    'feed': 5,
+    'download_shopping_cart': 2,
+    'recipe_create': 2,
+}
+PERCENTILES = (50, 95, 99)
+
+
+def create_image():
+    buffer = BytesIO()
+    Image.new('RGB', (600, 400), (200, 120, 80)).save(buffer, 'JPEG')
+    return ('data:image/jpeg;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+def summarize(timings, errors, elapsed=None):
+    timings = np.array(timings) * 1000
+    summary = {
+        'count': len(timings),
+        'errors': errors,
+        'rps': round(len(timings) / (elapsed or timings.sum() / 1000), 1),
+        'mean': round(float(timings.mean()), 2),
+    }
+    for percentile, value in zip(
+            PERCENTILES, np.percentile(timings, PERCENTILES)):
+        summary[f'p{percentile}'] = round(float(value), 2)
+    return summary
+
+
+class Benchmark:
+    """Последовательный прогон смеси запросов через тестовый клиент.
+
+    Расписание запросов определяется только seed и данными в базе,
+    поэтому прогоны на разных коммитах сравнимы между собой.
+    """
+
+    def __init__(self, options):
+        self.rng = random.Random(options['seed'])
+        users = list(User.objects.filter(
+            username__startswith=options['prefix']).order_by('pk')[
+                :options['users']])
+        if not users:
+            raise CommandError(
+                f'Нет пользователей с префиксом {options["prefix"]}: '
+                f'сначала выполните generate_dataset.')
+        self.clients = []
+        self.client_users = {}
+        for user in users:
+            client = APIClient()
+            token, _ = Token.objects.get_or_create(user=user)
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+            self.clients.append(client)
+            self.client_users[client] = user.pk
+        self.members = defaultdict(set)
+        for model, action in ((Favorite, 'favorite'),
+                              (ShoppingCart, 'shopping_cart')):
+            for user_id, recipe_id in model.objects.filter(
+                    user__in=users).values_list('user_id', 'recipe_id'):
+                self.members[user_id, action].add(recipe_id)
+        self.recipes = list(Recipe.objects.order_by('pk').values_list(
+            'pk', flat=True))
+        self.ingredients = list(Ingredient.objects.order_by('pk').values_list(
+            'pk', 'name'))
+        self.tags = list(Tag.objects.order_by('pk').values_list(
+            'pk', 'slug'))
+        if not self.recipes or not self.ingredients or not self.tags:
+            raise CommandError(
+                'Для прогона нужны рецепты, ингредиенты и теги.')
+        self.image = create_image()
+        self.created = []
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def request(self, name, method, client, path, data=None):
+        started = perf_counter()
+        response = getattr(client, method)(path, data, format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        self.timings[name].append(perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+    def tag_query(self):
+        slugs = self.rng.sample(self.tags, self.rng.randint(0, 2))
+        return ''.join(f'&tags={slug}' for _, slug in slugs)
+
+    def recipe_list(self, client):
+        self.request('recipe_list', 'get', client,
+                     f'/api/recipes/?page={self.rng.randint(1, 5)}'
+                     f'{self.tag_query()}')
+
+    def recipe_detail(self, client):
+        self.request('recipe_detail', 'get', client,
+                     f'/api/recipes/{self.rng.choice(self.recipes)}/')
+
+    def ingredient_autocomplete(self, client):
+        _, name = self.rng.choice(self.ingredients)
+        self.request('ingredient_autocomplete', 'get', client,
+                     f'/api/ingredients/?name='
+                     f'{name[:self.rng.randint(1, 4)]}')
+
+    def toggle(self, name, client, action):
+        """Добавление и удаление по известному состоянию; данные не меняются.
+
+        Состояние берётся из базы при старте и не меняется: после пары
+        запросов рецепт возвращается туда, где был.
+        """
+        recipe_id = self.rng.choice(self.recipes)
+        path = f'/api/recipes/{recipe_id}/{action}/'
+        methods = ('post', 'delete')
+        if recipe_id in self.members[self.client_users[client], action]:
+            methods = ('delete', 'post')
+        for method in methods:
+            self.request(name, method, client, path)
+
+    def favorite_toggle(self, client):
+        self.toggle('favorite_toggle', client, 'favorite')
+
+    def shopping_cart_toggle(self, client):
+        self.toggle('shopping_cart_toggle', client, 'shopping_cart')
+
+    def subscriptions(self, client):
+        self.request('subscriptions', 'get', client,
+                     '/api/users/subscriptions/?recipes_limit=3')
+
+    def feed(self, client):
+        self.request('feed', 'get', client,
+                     f'/api/recipes/feed/?{self.tag_query()[1:]}')
+
+    def download_shopping_cart(self, client):
+        self.request('download_shopping_cart', 'get', client,
+                     '/api/recipes/download_shopping_cart/')
+
+    def recipe_create(self, client):
+        ingredients = self.rng.sample(
+            self.ingredients, min(len(self.ingredients),
+                                  self.rng.randint(3, 10)))
+        tags = self.rng.sample(self.tags, self.rng.randint(1, 2))
+        response = self.request('recipe_create', 'post', client,
+                                '/api/recipes/', {
+                                    'name': f'Бенчмарк {len(self.created)}',
+                                    'text': 'Рецепт для замера.',
+                                    'cooking_time': self.rng.randint(5, 90),
+                                    'image': self.image,
+                                    'tags': [pk for pk, _ in tags],
+                                    'ingredients': [
+                                        {'id': pk,
+                                         'amount': self.rng.randint(1, 500)}
+                                        for pk, _ in ingredients
+                                    ],
+                                })
+        if response.status_code == 201:
+            self.created.append(response.data['id'])
+
+    def schedule(self, count):
+        names = self.rng.choices(list(MIX), weights=list(MIX.values()),
+                                 k=count)
+        return [(name, self.rng.choice(self.clients)) for name in names]
+
+    def run(self, count):
+        started = perf_counter()
+        for name, client in self.schedule(count):
+            getattr(self, name)(client)
+        return perf_counter() - started
+
+    def reset(self):
+        self.timings.clear()
+        self.errors.clear()
+
+    def cleanup(self):
+        for recipe in Recipe.objects.filter(pk__in=self.created):
+            recipe.delete()
+
+    def report(self, elapsed):
+        timings = [value for values in self.timings.values()
+                   for value in values]
+        return {
+            'database': connection.vendor,
+            'total': summarize(timings, sum(self.errors.values()), elapsed),
+            'endpoints': {
+                name: summarize(values, self.errors[name])
+                for name, values in sorted(self.timings.items())
+            },
+        }
+
+
+def compare(report, baseline, tolerance):
+    """Эндпоинты, у которых p95 вырос больше чем на tolerance."""
+    regressions = {}
+    for name, summary in report['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if before and summary['p95'] > before['p95'] * (1 + tolerance):
+            regressions[name] = {'before': before['p95'],
+                                 'after': summary['p95']}
+    return regressions
+
+
+class Command(BaseCommand):
+    help = ('Замер пропускной способности и задержек API на '
+            'сгенерированных данных; отчёт выводится в JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--warmup', type=int, default=200)
+        parser.add_argument('--users', type=int, default=50,
+                            help='Сколько пользователей набора участвует.')
+        parser.add_argument('--prefix', default='user',
+                            help='Префикс пользователей generate_dataset.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для JSON-отчёта.')
+        parser.add_argument('--baseline',
+                            help='Отчёт предыдущего прогона для сравнения.')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Допустимый рост p95 относительно '
+                                 'baseline.')
+
+    def handle(self, *args, **options):
+        with override_settings(ALLOWED_HOSTS=[*ALLOWED_HOSTS, 'testserver']):
+            benchmark = Benchmark(options)
+            try:
+                benchmark.run(options['warmup'])
+                benchmark.reset()
+                elapsed = benchmark.run(options['requests'])
+            finally:
+                benchmark.cleanup()
+        report = benchmark.report(elapsed)
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                report['regressions'] = compare(
+                    report, json.load(file), options['tolerance'])
+        content = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(content)
+        self.stdout.write(content)
+        if report.get('regressions'):
+            raise CommandError(
+                'Рост p95: ' + ', '.join(report['regressions']))
@@ -0,0 +1,43 @@
+from itertools import groupby
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.minhash import get_buckets, get_signature
+from recipes.models import Recipe, RecipeBucket, RecipeIngredient
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт MinHash-сигнатур рецептов и таблицы корзин LSH.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        rows = RecipeIngredient.objects.order_by('recipe_id').values_list(
+            'recipe_id', 'ingredient_id').iterator(chunk_size=batch_size)
+        recipes, buckets = [], []
+        total = 0
+        with transaction.atomic():
+            RecipeBucket.objects.all().delete()
+            for recipe_id, group in groupby(rows, key=lambda row: row[0]):
+                signature = get_signature(pk for _, pk in group)
+                recipes.append(Recipe(pk=recipe_id, minhash=signature))
+                buckets.extend(
+                    RecipeBucket(recipe_id=recipe_id, band=band,
+                                 bucket=bucket)
+                    for band, bucket in get_buckets(signature)
+                )
+                if len(recipes) >= batch_size:
+                    total += self.save(recipes, buckets)
+                    recipes, buckets = [], []
+            total += self.save(recipes, buckets)
+        self.stdout.write(f'Обновлено рецептов: {total}')
+
+    def save(self, recipes, buckets):
+        Recipe.objects.bulk_update(recipes, ['minhash'])
+        RecipeBucket.objects.bulk_create(buckets)
+        return len(recipes)
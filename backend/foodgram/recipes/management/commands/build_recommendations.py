@@ -0,0 +1,80 @@
+from itertools import chain
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from scipy import sparse
+
+from foodgram.settings import RECOMMENDATIONS_CHUNK_SIZE, RECOMMENDATIONS_TOP_K
+from recipes.models import Favorite, RecipeNeighbor
+
+BATCH_SIZE = 10000
+
+
+def favorites_matrix(batch_size=BATCH_SIZE):
+    """Пары читаются курсором прямо в массив, без списка кортежей."""
+    rows = Favorite.objects.order_by().values_list(
+        'user_id', 'recipe_id').iterator(chunk_size=batch_size)
+    pairs = np.fromiter(chain.from_iterable(rows),
+                        dtype=np.int64).reshape(-1, 2)
+    users, user_index = np.unique(pairs[:, 0], return_inverse=True)
+    recipes, recipe_index = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (user_index, recipe_index)),
+        shape=(len(users), len(recipes))
+    )
+    return matrix, recipes.tolist()
+
+
+def top_neighbors(matrix, top_k, chunk_size):
+    """Косинусное сходство рецептов по пользователям, блоками по строкам."""
+    norms = np.sqrt(np.asarray(matrix.sum(axis=0)).ravel())
+    normalized = (matrix @ sparse.diags(1 / norms)).tocsc()
+    transposed = normalized.T.tocsr()
+    for start in range(0, matrix.shape[1], chunk_size):
+        similarity = (transposed[start:start + chunk_size]
+                      @ normalized).tocsr()
+        for row in range(similarity.shape[0]):
+            begin, end = similarity.indptr[row], similarity.indptr[row + 1]
+            columns = similarity.indices[begin:end]
+            scores = similarity.data[begin:end]
+            keep = columns != start + row
+            columns, scores = columns[keep], scores[keep]
+            if len(scores) > top_k:
+                best = np.argpartition(-scores, top_k)[:top_k]
+                columns, scores = columns[best], scores[best]
+            yield start + row, columns, scores
+
+
+class Command(BaseCommand):
+    help = ('Пересчёт похожих рецептов по совместным добавлениям '
+            'в избранное.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int,
+                            default=RECOMMENDATIONS_TOP_K)
+        parser.add_argument('--chunk-size', type=int,
+                            default=RECOMMENDATIONS_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        matrix, recipes = favorites_matrix()
+        created = 0
+        with transaction.atomic():
+            RecipeNeighbor.objects.all().delete()
+            batch = []
+            for row, columns, scores in top_neighbors(
+                    matrix, options['top_k'], options['chunk_size']):
+                batch.extend(
+                    RecipeNeighbor(recipe_id=recipes[row],
+                                   neighbor_id=recipes[column],
+                                   score=score)
+                    for column, score in zip(columns.tolist(),
+                                             scores.tolist())
+                )
+                if len(batch) >= options['chunk_size']:
+                    RecipeNeighbor.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            RecipeNeighbor.objects.bulk_create(batch)
+            created += len(batch)
+        self.stdout.write(f'Рецептов: {len(recipes)}, связей: {created}')
@@ -0,0 +1,332 @@
+import multiprocessing
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from time import monotonic
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections
+from django.db.models import F, Max
+from PIL import Image
+
+from api.cache import bump_data_version
+from api.search import update_search_vectors
+from foodgram.settings import FEED_BACKFILL_SIZE, FEED_FANOUT_LIMIT
+from recipes.changes import invalidate_recipe_changes
+from recipes.models import (FeedEntry, Favorite, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, StoredFile, Tag)
+from users.models import Follow, User
+
+BATCH_SIZE = 5000
+START_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+DEFAULT_TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Сергей', 'Елена',
+               'Дмитрий')
+LAST_NAMES = ('Иванова', 'Смирнов', 'Кузнецова', 'Попов', 'Соколова',
+              'Лебедев', 'Новикова', 'Морозов')
+DISHES = ('Суп', 'Салат', 'Пирог', 'Рагу', 'Каша', 'Запеканка', 'Омлет',
+          'Паста', 'Плов', 'Блины')
+ADJECTIVES = ('домашний', 'быстрый', 'летний', 'пряный', 'сытный',
+              'лёгкий', 'праздничный', 'бабушкин')
+
+KINDS = ('users', 'recipes', 'follows', 'favorites', 'carts')
+
+
+@contextmanager
+def explicit_pub_date():
+    """bulk_create иначе проставит всем рецептам текущее время."""
+    field = Recipe._meta.get_field('pub_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def power_law_cdf(size, alpha, rng):
+    """Накопленные веса Ципфа по случайной перестановке id."""
+    weights = 1 / np.arange(1, size + 1) ** alpha
+    cdf = np.cumsum(rng.permutation(weights))
+    return cdf / cdf[-1]
+
+
+def draw(cdf, rng, size):
+    return np.minimum(np.searchsorted(cdf, rng.random(size)), len(cdf) - 1)
+
+
+class Dataset:
+    """Параметры генерации; каждый блок строится своим генератором.
+
+    Генератор блока зависит только от seed, вида данных и номера блока,
+    поэтому результат не зависит от числа процессов.
+    """
+
+    def __init__(self, options, ingredient_ids, tag_ids, image):
+        self.seed = options['seed']
+        self.users = options['users']
+        self.recipes = options['recipes']
+        self.follows = options['follows']
+        self.favorites = options['favorites']
+        self.carts = options['carts']
+        self.alpha = options['alpha']
+        self.prefix = options['prefix']
+        self.password = make_password(options['password'])
+        self.batch_size = options['batch_size']
+        self.ingredient_ids = np.array(ingredient_ids)
+        self.tag_ids = np.array(tag_ids)
+        self.image = image
+        self.first_user = (User.objects.aggregate(
+            last=Max('pk'))['last'] or 0) + 1
+        self.first_recipe = (Recipe.objects.aggregate(
+            last=Max('pk'))['last'] or 0) + 1
+        rng = np.random.default_rng([self.seed, len(KINDS)])
+        self.author_cdf = power_law_cdf(self.users, self.alpha, rng)
+        self.recipe_cdf = power_law_cdf(self.recipes, self.alpha, rng)
+        self.ingredient_cdf = power_law_cdf(len(ingredient_ids), 1.0, rng)
+
+    def tasks(self):
+        for kind, total in (('users', self.users),
+                            ('recipes', self.recipes),
+                            ('follows', self.users),
+                            ('favorites', self.users),
+                            ('carts', self.users)):
+            for chunk, start in enumerate(
+                    range(0, total, self.batch_size)):
+                yield kind, chunk, start, min(start + self.batch_size, total)
+
+    def run(self, task):
+        kind, chunk, start, stop = task
+        rng = np.random.default_rng([self.seed, KINDS.index(kind), chunk])
+        return getattr(self, f'generate_{kind}')(rng, start, stop)
+
+    def generate_users(self, rng, start, stop):
+        users = [
+            User(
+                pk=self.first_user + number,
+                username=f'{self.prefix}{number}',
+                email=f'{self.prefix}{number}@example.com',
+                first_name=FIRST_NAMES[first],
+                last_name=LAST_NAMES[last],
+                password=self.password,
+            )
+            for number, first, last in zip(
+                range(start, stop),
+                rng.integers(len(FIRST_NAMES), size=stop - start).tolist(),
+                rng.integers(len(LAST_NAMES), size=stop - start).tolist())
+        ]
+        User.objects.bulk_create(users)
+        return len(users)
+
+    def generate_recipes(self, rng, start, stop):
+        size = stop - start
+        authors = self.first_user + draw(self.author_cdf, rng, size)
+        counts = np.clip(rng.poisson(7, size) + 2, 2, 20)
+        seconds = rng.integers(365 * 24 * 3600, size=size)
+        recipes, ingredients, tags = [], [], []
+        for offset in range(size):
+            pk = self.first_recipe + start + offset
+            dish = DISHES[rng.integers(len(DISHES))]
+            adjective = ADJECTIVES[rng.integers(len(ADJECTIVES))]
+            recipes.append(Recipe(
+                pk=pk,
+                author_id=int(authors[offset]),
+                name=f'{dish} {adjective} №{start + offset}',
+                text=f'{dish} {adjective}: смешать ингредиенты и готовить '
+                     f'до готовности.',
+                image=self.image,
+                cooking_time=int(rng.integers(5, 180)),
+                pub_date=START_DATE + timedelta(
+                    seconds=int(seconds[offset])),
+            ))
+            chosen = np.unique(self.ingredient_ids[draw(
+                self.ingredient_cdf, rng, counts[offset] * 2)])
+            rng.shuffle(chosen)
+            ingredients.extend(
+                RecipeIngredient(recipe_id=pk, ingredient_id=ingredient,
+                                 amount=amount)
+                for ingredient, amount in zip(
+                    chosen[:counts[offset]].tolist(),
+                    rng.integers(1, 500, size=counts[offset]).tolist())
+            )
+            tags.extend(
+                Recipe.tags.through(recipe_id=pk, tag_id=tag)
+                for tag in rng.choice(
+                    self.tag_ids,
+                    size=min(int(rng.integers(1, 4)), len(self.tag_ids)),
+                    replace=False).tolist()
+            )
+        with explicit_pub_date():
+            Recipe.objects.bulk_create(recipes)
+        RecipeIngredient.objects.bulk_create(ingredients)
+        Recipe.tags.through.objects.bulk_create(tags)
+        return len(recipes)
+
+    def pairs(self, rng, start, stop, average, cdf, first_target):
+        counts = rng.poisson(average, stop - start)
+        users = np.repeat(
+            np.arange(self.first_user + start, self.first_user + stop),
+            counts)
+        targets = first_target + draw(cdf, rng, len(users))
+        pairs = np.unique(np.stack((users, targets), axis=1), axis=0)
+        return pairs[pairs[:, 0] != pairs[:, 1]].tolist()
+
+    def generate_follows(self, rng, start, stop):
+        follows = [
+            Follow(user_id=user, author_id=author)
+            for user, author in self.pairs(rng, start, stop, self.follows,
+                                           self.author_cdf, self.first_user)
+        ]
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        return len(follows)
+
+    def generate_favorites(self, rng, start, stop):
+        favorites = [
+            Favorite(user_id=user, recipe_id=recipe)
+            for user, recipe in self.pairs(
+                rng, start, stop, self.favorites, self.recipe_cdf,
+                self.first_recipe)
+        ]
+        Favorite.objects.bulk_create(favorites, ignore_conflicts=True)
+        return len(favorites)
+
+    def generate_carts(self, rng, start, stop):
+        carts = [
+            ShoppingCart(user_id=user, recipe_id=recipe)
+            for user, recipe in self.pairs(
+                rng, start, stop, self.carts, self.recipe_cdf,
+                self.first_recipe)
+        ]
+        ShoppingCart.objects.bulk_create(carts, ignore_conflicts=True)
+        return len(carts)
+
+
+dataset = None
+
+
+def run_task(task):
+    return task[0], dataset.run(task)
+
+
+def create_image():
+    buffer = BytesIO()
+    Image.new('RGB', (600, 400), (230, 200, 160)).save(buffer, 'JPEG')
+    name = default_storage.save('recipes/dataset.jpg',
+                                ContentFile(buffer.getvalue()))
+    return name
+
+
+def fill_feed(first_user):
+    """Лента подписчиков, как при подписке: последние рецепты авторов."""
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(FeedEntry._meta.db_table)} '
+            f'(user_id, recipe_id, author_id) '
+            f'SELECT f.user_id, r.id, r.author_id '
+            f'FROM {quote(Follow._meta.db_table)} f '
+            f'JOIN (SELECT id, author_id, ROW_NUMBER() OVER ('
+            f'PARTITION BY author_id ORDER BY pub_date DESC, id DESC) n '
+            f'FROM {quote(Recipe._meta.db_table)}) r '
+            f'ON r.author_id = f.author_id '
+            f'JOIN {quote(User._meta.db_table)} a ON a.id = f.author_id '
+            f'WHERE f.user_id >= %s AND r.n <= %s '
+            f'AND a.followers_count <= %s '
+            f'ON CONFLICT DO NOTHING',
+            [first_user, FEED_BACKFILL_SIZE, FEED_FANOUT_LIMIT]
+        )
+        return cursor.rowcount
+
+
+class Command(BaseCommand):
+    help = ('Генерация воспроизводимого синтетического набора данных: '
+            'пользователи, рецепты, подписки, избранное и корзины.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--follows', type=float, default=20,
+                            help='Среднее число подписок пользователя.')
+        parser.add_argument('--favorites', type=float, default=50,
+                            help='Среднее число рецептов в избранном.')
+        parser.add_argument('--carts', type=float, default=5,
+                            help='Среднее число рецептов в корзине.')
+        parser.add_argument('--alpha', type=float, default=1.1,
+                            help='Показатель степенного распределения '
+                                 'популярности авторов и рецептов.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='user')
+        parser.add_argument('--password', default='dataset-password')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Число процессов; на SQLite всегда 1.')
+        parser.add_argument('--recommendations', action='store_true',
+                            help='Пересчитать похожие рецепты.')
+
+    def handle(self, *args, **options):
+        global dataset
+        started = monotonic()
+        ingredient_ids = list(Ingredient.objects.order_by(
+            'pk').values_list('pk', flat=True))
+        if not ingredient_ids:
+            raise CommandError(
+                'Нет ингредиентов: сначала выполните load_ingredients.')
+        if User.objects.filter(
+                username__startswith=options['prefix']).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {options["prefix"]} уже есть: '
+                f'укажите другой --prefix.')
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=name, color=color, slug=slug)
+                for name, color, slug in DEFAULT_TAGS)
+        tag_ids = list(Tag.objects.order_by('pk').values_list(
+            'pk', flat=True))
+        image = create_image()
+        dataset = Dataset(options, ingredient_ids, tag_ids, image)
+
+        workers = options['workers']
+        if connection.vendor == 'sqlite':
+            workers = 1
+        totals = dict.fromkeys(KINDS, 0)
+        for kind in KINDS:
+            tasks = [task for task in dataset.tasks() if task[0] == kind]
+            if workers > 1:
+                connections.close_all()
+                with multiprocessing.get_context('fork').Pool(
+                        workers) as pool:
+                    results = pool.map(run_task, tasks)
+            else:
+                results = map(run_task, tasks)
+            for _, count in results:
+                totals[kind] += count
+            self.stdout.write(f'{kind}: {totals[kind]}')
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [User, Recipe]):
+                cursor.execute(sql)
+        StoredFile.objects.filter(name=image).update(
+            references=F('references') + totals['recipes'] - 1)
+        call_command('reconcile_counters', stdout=self.stdout)
+        self.stdout.write(f'feed: {fill_feed(dataset.first_user)}')
+        update_search_vectors(Recipe.objects.filter(
+            pk__gte=dataset.first_recipe))
+        call_command('build_minhash', stdout=self.stdout)
+        if options['recommendations']:
+            call_command('build_recommendations', stdout=self.stdout)
+        for scope in ('tags', Recipe._meta.label_lower,
+                      User._meta.label_lower):
+            bump_data_version(scope)
+        invalidate_recipe_changes()
+        self.stdout.write(
+            f'Готово за {monotonic() - started:.1f} с.')
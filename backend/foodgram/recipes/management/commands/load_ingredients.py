@@ -1,32 +1,135 @@
 import csv
+import json
 import os
-from foodgram import settings
+from itertools import islice
+from tempfile import SpooledTemporaryFile
+from time import monotonic
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
-from django.core.management.base import BaseCommand
-from progress.bar import IncrementalBar
+from api.cache import bump_data_version
+from foodgram import settings
 from recipes.models import Ingredient
 
+BATCH_SIZE = 1000
+READ_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('JSON-файл должен содержать список ингредиентов.')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(READ_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный JSON-файл.')
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        yield item['name'], item['measurement_unit']
 
-def ingredient_create(row):
-    Ingredient.objects.get_or_create(
-        name=row[0],
-        measurement_unit=row[1]
-    )
+
+def read_rows(path):
+    reader = read_json if path.lower().endswith('.json') else read_csv
+    with open(path, 'r', encoding='utf-8') as file:
+        for name, measurement_unit in reader(file):
+            name, measurement_unit = name.strip(), measurement_unit.strip()
+            if name and measurement_unit:
+                yield name, measurement_unit
+
+
+def bulk_load(rows, batch_size):
+    total = 0
+    while True:
+        batch = [
+            Ingredient(name=name, measurement_unit=measurement_unit)
+            for name, measurement_unit in islice(rows, batch_size)
+        ]
+        if not batch:
+            return total
+        Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+        total += len(batch)
+
+
+def copy_load(rows):
+    if connection.vendor != 'postgresql':
+        raise CommandError('--copy поддерживается только для PostgreSQL.')
+    total = 0
+    with SpooledTemporaryFile(mode='w+', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        for row in rows:
+            writer.writerow(row)
+            total += 1
+        file.seek(0)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_staging '
+                '(name varchar(200), measurement_unit varchar(200)) '
+                'ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY ingredient_staging FROM STDIN WITH (FORMAT csv)', file)
+            cursor.execute(
+                f'INSERT INTO {Ingredient._meta.db_table} '
+                '(name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredient_staging '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+    return total
 
 
 class Command(BaseCommand):
     help = "Загрузка ингредиентов в базу."
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            default=os.path.join(settings.BASE_DIR, 'ingredients.csv'),
+            help='Путь к файлу ингредиентов в формате .csv или .json.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество строк в одном INSERT.'
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Загрузить через COPY во временную таблицу (PostgreSQL).'
+        )
+
     def handle(self, *args, **options):
-        path = os.path.join(settings.BASE_DIR, 'ingredients.csv')
-        with open(path, 'r', encoding='utf-8') as file:
-            row_count = sum(1 for row in file)
-        with open(path, 'r', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            bar = IncrementalBar('ingredients.csv'.ljust(17), max=row_count)
-            next(reader)
-            for row in reader:
-                bar.next()
-                ingredient_create(row)
-            bar.finish()
-        self.stdout.write("[!] Ингредиенты загружены успешно.")
+        if not os.path.exists(options['source']):
+            raise CommandError(f"Файл {options['source']} не найден.")
+        rows = read_rows(options['source'])
+        count_before = Ingredient.objects.count()
+        started = monotonic()
+        if options['copy']:
+            total = copy_load(rows)
+        else:
+            total = bulk_load(rows, options['batch_size'])
+        elapsed = max(monotonic() - started, 1e-6)
+        created = Ingredient.objects.count() - count_before
+        if created:
+            bump_data_version('ingredients')
+        self.stdout.write(
+            f"[!] Ингредиенты загружены успешно: обработано {total}, "
+            f"добавлено {created}, {total / elapsed:.0f} строк/с."
+        )
@@ -0,0 +1,75 @@
+from time import sleep
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, transaction
+
+from foodgram.settings import IMAGE_JOB_MAX_ATTEMPTS, IMAGE_JOB_POLL_INTERVAL
+from recipes.images import process_recipe_image
+from recipes.models import Recipe, RecipeImageJob
+
+
+def run_next_job():
+    with transaction.atomic():
+        job = RecipeImageJob.objects.select_for_update(
+            skip_locked=True
+        ).select_related('recipe').filter(
+            status=RecipeImageJob.PENDING
+        ).first()
+        if job is None:
+            return None
+        job.attempts += 1
+        try:
+            if job.recipe.image.name == job.image:
+                process_recipe_image(job.recipe)
+        except Exception as error:
+            job.error = str(error)
+            if job.attempts >= IMAGE_JOB_MAX_ATTEMPTS:
+                job.status = RecipeImageJob.FAILED
+        else:
+            job.status = RecipeImageJob.DONE
+            job.error = ''
+        job.save(update_fields=['status', 'attempts', 'error'])
+        return job
+
+
+class Command(BaseCommand):
+    help = "Фоновая обработка загруженных картинок рецептов."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать текущую очередь и завершиться.'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=IMAGE_JOB_POLL_INTERVAL,
+            help='Пауза между опросами пустой очереди, в секундах.'
+        )
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='Поставить в очередь рецепты без уменьшенных копий.'
+        )
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            jobs = RecipeImageJob.objects.bulk_create(
+                RecipeImageJob(recipe_id=pk, image=image)
+                for pk, image in Recipe.objects.filter(
+                    image_variants={}
+                ).exclude(
+                    image_jobs__status=RecipeImageJob.PENDING
+                ).values_list('pk', 'image')
+            )
+            self.stdout.write(f'Добавлено в очередь: {len(jobs)}')
+        while True:
+            close_old_connections()
+            job = run_next_job()
+            if job is not None:
+                self.stdout.write(f'[{job.status}] {job.image}')
+                continue
+            if options['once']:
+                return
+            sleep(options['interval'])
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow, User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+def actual_count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = "Пересчёт денормализованных счётчиков рецептов и пользователей."
+
+    def handle(self, *args, **options):
+        for model, field, counted_model, counted_field in COUNTERS:
+            actual = actual_count(counted_model, counted_field)
+            with transaction.atomic():
+                fixed = model.objects.exclude(
+                    **{field: actual}
+                ).update(**{field: actual})
+            self.stdout.write(
+                f'{model._meta.model_name}.{field}: исправлено {fixed}')
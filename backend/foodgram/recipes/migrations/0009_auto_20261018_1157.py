@@ -0,0 +1,49 @@
+# Generated by Django 3.2 on 2026-10-18 11:57
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    counters = (
+        ('recipes', 'Recipe', 'favorites_count', 'recipes', 'Favorite',
+         'recipe'),
+        ('recipes', 'Recipe', 'carts_count', 'recipes', 'ShoppingCart',
+         'recipe'),
+        ('users', 'User', 'recipes_count', 'recipes', 'Recipe', 'author'),
+        ('users', 'User', 'followers_count', 'users', 'Follow', 'author'),
+    )
+    for app, model, field, counted_app, counted_model, counted_field in (
+            counters):
+        counted = apps.get_model(counted_app, counted_model)
+        apps.get_model(app, model).objects.update(**{field: Coalesce(
+            Subquery(
+                counted.objects.filter(
+                    **{counted_field: OuterRef('pk')}
+                ).order_by().values(counted_field).annotate(
+                    total=Count('pk')
+                ).values('total')
+            ), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_recipe_pub_date_id'),
+        ('users', '0003_auto_20261018_1157'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='carts_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Добавлений в корзину'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 3.2 on 2026-10-18 12:05
+
+from itertools import groupby
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from recipes.minhash import get_buckets, get_signature
+
+BATCH_SIZE = 1000
+
+
+def fill_minhash(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeBucket = apps.get_model('recipes', 'RecipeBucket')
+    rows = apps.get_model('recipes', 'RecipeIngredient').objects.order_by(
+        'recipe_id').values_list('recipe_id', 'ingredient_id').iterator(
+            chunk_size=BATCH_SIZE)
+    recipes, buckets = [], []
+    for recipe_id, group in groupby(rows, key=lambda row: row[0]):
+        signature = get_signature(pk for _, pk in group)
+        recipes.append(Recipe(pk=recipe_id, minhash=signature))
+        buckets.extend(
+            RecipeBucket(recipe_id=recipe_id, band=band, bucket=bucket)
+            for band, bucket in get_buckets(signature)
+        )
+        if len(recipes) >= BATCH_SIZE:
+            Recipe.objects.bulk_update(recipes, ['minhash'])
+            RecipeBucket.objects.bulk_create(buckets)
+            recipes, buckets = [], []
+    Recipe.objects.bulk_update(recipes, ['minhash'])
+    RecipeBucket.objects.bulk_create(buckets)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_auto_20261018_1204'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='minhash',
+            field=models.JSONField(default=list, editable=False, verbose_name='MinHash-сигнатура состава'),
+        ),
+        migrations.CreateModel(
+            name='RecipeBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField(verbose_name='Полоса')),
+                ('bucket', models.BigIntegerField(verbose_name='Корзина LSH')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Корзина LSH',
+                'verbose_name_plural': 'Корзины LSH',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipebucket',
+            index=models.Index(fields=['band', 'bucket'], name='lsh_bucket'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipebucket',
+            constraint=models.UniqueConstraint(fields=('recipe', 'band'), name='unique_recipe_band'),
+        ),
+        migrations.RunPython(fill_minhash, migrations.RunPython.noop),
+    ]
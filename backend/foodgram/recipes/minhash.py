@@ -0,0 +1,93 @@
+import threading
+from hashlib import blake2b
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from foodgram.settings import (MINHASH_BANDS, MINHASH_PERMUTATIONS,
+                               MINHASH_SEED)
+from .models import Recipe, RecipeBucket, RecipeIngredient
+
+PRIME = (1 << 31) - 1
+_random = np.random.RandomState(MINHASH_SEED)
+COEFFICIENTS = _random.randint(1, PRIME, size=(MINHASH_PERMUTATIONS, 1),
+                               dtype=np.int64)
+OFFSETS = _random.randint(0, PRIME, size=(MINHASH_PERMUTATIONS, 1),
+                          dtype=np.int64)
+_pending = threading.local()
+
+
+def get_signature(ingredient_ids):
+    ids = np.fromiter(set(ingredient_ids), dtype=np.int64)
+    if not len(ids):
+        return []
+    return ((COEFFICIENTS * ids + OFFSETS) % PRIME).min(axis=1).tolist()
+
+
+def get_buckets(signature):
+    rows = np.array(signature, dtype=np.int64).reshape(MINHASH_BANDS, -1)
+    return [
+        (band, int.from_bytes(
+            blake2b(row.tobytes(), digest_size=8).digest(), 'big',
+            signed=True))
+        for band, row in enumerate(rows)
+    ]
+
+
+def estimate_similarity(signature, other):
+    if len(signature) != len(other) or not signature:
+        return 0.0
+    return float(np.mean(np.array(signature) == np.array(other)))
+
+
+def update_recipe_minhash(recipe_id):
+    signature = get_signature(RecipeIngredient.objects.filter(
+        recipe_id=recipe_id).values_list('ingredient_id', flat=True))
+    current = Recipe.objects.filter(pk=recipe_id).values_list(
+        'minhash', flat=True).first()
+    if current is None or current == signature:
+        return
+    Recipe.objects.filter(pk=recipe_id).update(minhash=signature)
+    RecipeBucket.objects.filter(recipe_id=recipe_id).delete()
+    if signature:
+        RecipeBucket.objects.bulk_create(
+            RecipeBucket(recipe_id=recipe_id, band=band, bucket=bucket)
+            for band, bucket in get_buckets(signature)
+        )
+
+
+def flush_minhash_updates():
+    recipe_ids = getattr(_pending, 'recipe_ids', None) or set()
+    _pending.recipe_ids = set()
+    for recipe_id in recipe_ids:
+        update_recipe_minhash(recipe_id)
+
+
+def schedule_minhash_update(recipe_id):
+    """Пересчёт после коммита, не больше одного раза на рецепт.
+
+    Отложенные id копятся в наборе потока; при откате транзакции они
+    пересчитаются со следующим коммитом, что безвредно.
+    """
+    recipe_ids = getattr(_pending, 'recipe_ids', None)
+    if recipe_ids is None:
+        recipe_ids = _pending.recipe_ids = set()
+    recipe_ids.add(recipe_id)
+    transaction.on_commit(flush_minhash_updates)
+
+
+def find_similar(signature, threshold, queryset=Recipe.objects):
+    """Рецепты с оценкой сходства Жаккара по ингредиентам >= threshold."""
+    if not signature:
+        return {}
+    buckets = Q()
+    for band, bucket in get_buckets(signature):
+        buckets |= Q(buckets__band=band, buckets__bucket=bucket)
+    candidates = queryset.filter(buckets).order_by().distinct().values_list(
+        'pk', 'minhash')
+    scores = {
+        pk: estimate_similarity(signature, minhash)
+        for pk, minhash in candidates
+    }
+    return {pk: score for pk, score in scores.items() if score >= threshold}
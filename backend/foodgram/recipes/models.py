@@ -1,8 +1,15 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import (BooleanField, Exists, F, OuterRef, Prefetch,
+                              Value, Window)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 
+from foodgram.mixins import DenormalizedFieldsMixin
 from foodgram.settings import RECIPES_MAX_LENGTH
-from users.models import User
+from users.models import Follow, User
+from .indexes import SearchVectorIndex
 from .validators import create_hex_validator, create_slug_validator
 
 
@@ -49,12 +56,72 @@ class Ingredient(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_unit'
+            )
+        ]
 
     def __str__(self):
         return f'{self.name}, {self.measurement_unit}'
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self, user=None):
+        return self.defer('minhash', 'search_vector').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient_recipe',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient')
+            ),
+            Prefetch(
+                'author',
+                queryset=User.objects.annotate(
+                    is_subscribed=user_flag(
+                        Follow, user, author=OuterRef('pk'))
+                )
+            ),
+        )
+
+    def with_user_flags(self, user):
+        return self.annotate(
+            is_favorited=user_flag(Favorite, user, recipe=OuterRef('pk')),
+            is_in_shopping_cart=user_flag(
+                ShoppingCart, user, recipe=OuterRef('pk')),
+        )
+
+    def latest_per_author(self, limit=None):
+        """Не больше limit новых рецептов каждого автора.
+
+        Рецепты нумеруются одним проходом ROW_NUMBER() по уже
+        отфильтрованному набору, без подзапроса на каждую строку.
+        """
+        if limit is None:
+            return self
+        ranked = self.annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=[F('author_id')],
+                order_by=[F('pub_date').desc(), F('pk').desc()],
+            )
+        ).values('pk', 'position')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(pk__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            f'WHERE ranked.position <= %s',
+            (*params, limit)
+        ))
+
+
+def user_flag(model, user, **lookups):
+    if user is None or not user.is_authenticated:
+        return Value(False, output_field=BooleanField())
+    return Exists(model.objects.filter(user=user, **lookups))
+
+
+class Recipe(DenormalizedFieldsMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -69,6 +136,11 @@ class Recipe(models.Model):
         'Картинка',
         upload_to='recipes/',
     )
+    image_variants = models.JSONField(
+        'Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+    )
     text = models.TextField(
         'Текстовое описание',
     )
@@ -91,11 +163,42 @@ class Recipe(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(
+        'Добавлений в избранное',
+        default=0
+    )
+    carts_count = models.PositiveIntegerField(
+        'Добавлений в корзину',
+        default=0
+    )
+    minhash = models.JSONField(
+        'MinHash-сигнатура состава',
+        default=list,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    denormalized_fields = ('image_variants', 'favorites_count', 'carts_count',
+                           'minhash', 'search_vector')
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='recipe_author_pub_date_id'),
+            SearchVectorIndex(fields=['search_vector'],
+                              name='recipe_search_vector_gin'),
+        ]
 
     def __str__(self):
         return self.name
@@ -181,3 +284,183 @@ class Favorite(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил рецепт {self.recipe} в Избранное'
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', 'author'], name='feed_user_author'),
+        ]
+
+
+class RecipeImageJob(models.Model):
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (DONE, 'Обработано'),
+        (FAILED, 'Ошибка'),
+    )
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='image_jobs',
+        verbose_name='Рецепт'
+    )
+    image = models.CharField(
+        'Исходный файл',
+        max_length=255,
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=16,
+        choices=STATUSES,
+        default=PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(
+        'Попытки',
+        default=0,
+    )
+    error = models.TextField(
+        'Ошибка',
+        blank=True,
+    )
+    created = models.DateTimeField(
+        'Создано',
+        auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = 'Обработка картинки'
+        verbose_name_plural = 'Обработка картинок'
+        ordering = ('created',)
+        indexes = [
+            models.Index(fields=['status', 'created'],
+                         name='image_job_queue'),
+        ]
+
+    def __str__(self):
+        return f'{self.image} ({self.get_status_display()})'
+
+
+class StoredFile(models.Model):
+    name = models.CharField(
+        'Путь к файлу',
+        max_length=255,
+        unique=True,
+    )
+    references = models.PositiveIntegerField(
+        'Количество ссылок',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+
+    def __str__(self):
+        return f'{self.name} ({self.references})'
+
+
+class RecipeChange(models.Model):
+    recipe_id = models.BigIntegerField(
+        'Рецепт',
+        null=True,
+        help_text='Пусто — изменились все рецепты.'
+    )
+
+    class Meta:
+        verbose_name = 'Изменение рецепта'
+        verbose_name_plural = 'Изменения рецептов'
+
+    def __str__(self):
+        return f'{self.pk}: {self.recipe_id or "все рецепты"}'
+
+
+class RecipeNeighbor(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbors',
+        verbose_name='Рецепт'
+    )
+    neighbor = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbor_of',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(
+        'Сходство'
+    )
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        ordering = ('recipe', '-score')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'neighbor'],
+                name='unique_recipe_neighbor'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} -> {self.neighbor} ({self.score:.3f})'
+
+
+class RecipeBucket(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='buckets',
+        verbose_name='Рецепт'
+    )
+    band = models.PositiveSmallIntegerField(
+        'Полоса'
+    )
+    bucket = models.BigIntegerField(
+        'Корзина LSH'
+    )
+
+    class Meta:
+        verbose_name = 'Корзина LSH'
+        verbose_name_plural = 'Корзины LSH'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'band'],
+                name='unique_recipe_band'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['band', 'bucket'], name='lsh_bucket'),
+        ]
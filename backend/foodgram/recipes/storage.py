@@ -0,0 +1,64 @@
+import hashlib
+import os
+from functools import partial
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+from .models import StoredFile
+
+
+class ContentHashStorage(FileSystemStorage):
+    """Хранит файлы под именем из SHA-256 содержимого.
+
+    Одинаковые загрузки записываются на диск один раз, а удаление
+    уменьшает счётчик ссылок и стирает файл только с последней ссылкой.
+    """
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(os.path.dirname(name),
+                            f'{digest.hexdigest()}{extension}')
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        with transaction.atomic():
+            stored, _ = StoredFile.objects.select_for_update().get_or_create(
+                name=name)
+            if not self.exists(name):
+                name = super()._save(name, content)
+            StoredFile.objects.filter(pk=stored.pk).update(
+                references=F('references') + 1)
+        return name
+
+    def delete(self, name):
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(
+                name=name).first()
+            if stored is not None and stored.references > 1:
+                StoredFile.objects.filter(pk=stored.pk).update(
+                    references=F('references') - 1)
+                return
+            if stored is not None:
+                StoredFile.objects.filter(pk=stored.pk).update(references=0)
+            transaction.on_commit(partial(self.delete_unreferenced, name))
+
+    def delete_unreferenced(self, name):
+        """Стирает файл, если после коммита на него так и нет ссылок.
+
+        Строка блокируется до проверки и держится до удаления файла:
+        параллельный _save, успевший сослаться на файл, оставит его на
+        месте, а пришедший позже дождётся блокировки и запишет файл
+        заново.
+        """
+        with transaction.atomic():
+            stored, _ = StoredFile.objects.select_for_update().get_or_create(
+                name=name)
+            if stored.references:
+                return
+            stored.delete()
+            super().delete(name)
@@ -2,5 +2,11 @@ from django.contrib import admin
 
 from .models import Follow, User
 
-admin.site.register(User)
+
+class UserAdmin(admin.ModelAdmin):
+    list_display = ('username', 'email', 'recipes_count', 'followers_count')
+    readonly_fields = ('recipes_count', 'followers_count')
+
+
+admin.site.register(User, UserAdmin)
 admin.site.register(Follow)
@@ -1,11 +1,12 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from foodgram.mixins import DenormalizedFieldsMixin
 from foodgram.settings import USERS_MAX_LENGTH
 from .validators import create_username_validator
 
 
-class User(AbstractUser):
+class User(DenormalizedFieldsMixin, AbstractUser):
     email = models.EmailField(
         unique=True,
         max_length=254
@@ -28,6 +29,16 @@ class User(AbstractUser):
     password = models.CharField(
         max_length=USERS_MAX_LENGTH
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0
+    )
+
+    denormalized_fields = ('recipes_count', 'followers_count')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'password', 'first_name', 'last_name']